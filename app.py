@@ -3,10 +3,27 @@ from geopy.geocoders import ArcGIS, Nominatim
 from rapidfuzz import process as rf_process, fuzz as rf_fuzz
 import folium
 from PIL import Image
+import hashlib
 import os
-import tempfile
 import re
-from faster_whisper import WhisperModel
+from concurrent.futures import ThreadPoolExecutor
+
+import gazetteer
+import geocode_cache
+import spatial_index
+import mission_planner
+import mission_export
+import thai_tokenizer
+import poi_index
+import request_profiler
+import suggest
+from offline_providers import OfflineGeocoder, OfflineLocation
+from audio_preprocess import preprocess as preprocess_audio, AudioRejectedError
+from model_manager import DEFAULT_TIER
+from transcription_worker import (
+    TranscriptionService, QueueFullError, TranscriptionTimeoutError, running_services
+)
+from thai_tokenizer import PYTHAINLP_AVAILABLE
 
 # streamlit_folium อาจจะต้อง import ไว้ข้างบนถ้ามีการใช้งานบ่อย
 try:
@@ -14,13 +31,6 @@ try:
 except ImportError:
     st_folium = None
 
-try:
-    import pythainlp
-    from pythainlp.tokenize import word_tokenize
-    PYTHAINLP_AVAILABLE = True
-except ImportError:
-    PYTHAINLP_AVAILABLE = False
-
 # Audio recorder - import แยกเพื่อ cloud compatibility
 AUDIO_RECORDER_AVAILABLE = False
 audio_recorder = None
@@ -30,73 +40,60 @@ try:
 except ImportError:
     pass
 
+# --- Profiling ต่อคำขอ: เปิดด้วย ?profile=1 หรือ PROFILE_ENABLED / PROFILE_SAMPLE_RATE (ดู request_profiler.py) ---
+def _profile_flag():
+    return st.query_params.get("profile") == "1"
+
 # --- Audio Transcription with Faster-Whisper (Optimized for Thai) ---
+# การถอดเสียงทำใน worker process แยก (ดู transcription_worker.py) ตั้งค่าได้ด้วย
+# WHISPER_WORKERS, WHISPER_CPU_THREADS, WHISPER_QUEUE_SIZE, WHISPER_TIMEOUT_S
+# และจัดการหน่วยความจำโมเดลด้วย WHISPER_MEMORY_BUDGET_MB, WHISPER_IDLE_UNLOAD_S (ดู model_manager.py)
 @st.cache_resource
-def load_whisper_model():
-    """โหลด faster-whisper model ที่ปรับแต่งสำหรับภาษาไทย"""
-    st.info("🧠 กำลังโหลดโมเดล Whisper ที่ปรับแต่งสำหรับภาษาไทย...")
-    
-    # ลำดับ priority: large-v3 -> large-v2 -> medium -> base
-    models_to_try = [
-        ("large-v3", "float16"),  # แม่นยำที่สุด
-        ("large-v2", "float16"),  # รองลงมา
-        ("medium", "int8"),       # เร็วและแม่นยำพอสมควร
-        ("base", "int8")         # fallback
-    ]
-    
-    for model_name, compute_type in models_to_try:
-        try:
-            st.info(f"🔄 กำลังลองโมเดล {model_name}...")
-            model = WhisperModel(model_name, device="cpu", compute_type=compute_type)
-            st.success(f"✅ โมเดล Whisper {model_name} โหลดสำเร็จ!")
-            return model
-        except Exception as e:
-            st.warning(f"⚠️ โมเดล {model_name} ล้มเหลว: {e}")
-            continue
-    
-    st.error("❌ ไม่สามารถโหลดโมเดล Whisper ได้เลย")
-    return None
+def load_transcription_service():
+    """เริ่ม worker processes ถอดเสียงภาษาไทย (ใช้ร่วมกันทุก session)"""
+    st.info("🧠 กำลังเริ่ม worker ถอดเสียง Whisper ที่ปรับแต่งสำหรับภาษาไทย...")
+    try:
+        return TranscriptionService()
+    except Exception as e:
+        st.error(f"❌ ไม่สามารถเริ่ม worker ถอดเสียงได้: {e}")
+        return None
 
-def transcribe_audio(audio_bytes, model):
-    """ถอดเสียง audio bytes โดยใช้ faster-whisper แบบปรับแต่งสำหรับภาษาไทย"""
-    if not model:
+@request_profiler.profiled("transcribe_audio", force=_profile_flag)
+def transcribe_audio(audio_bytes, service):
+    """เตรียมเสียง (mono 16 kHz ตัดเงียบ) แล้วส่งเข้าคิวถอดเสียง รอผลไม่เกิน timeout ที่ตั้งไว้"""
+    if not service:
         return ""
     
+    # 1. เตรียมเสียงก่อน: คลิปที่เงียบหรือสั้นเกินไปไม่ต้องเข้าโมเดลเลย
     try:
-        with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as tmp_file:
-            tmp_file.write(audio_bytes)
-            tmp_file_path = tmp_file.name
-        
-        # ปรับ parameters เพื่อความแม่นยำสูงสุด
-        segments, info = model.transcribe(
-            tmp_file_path,
-            language="th",              # บังคับภาษาไทย
-            beam_size=10,               # เพิ่มจาก 5 เป็น 10 เพื่อความแม่นยำ
-            best_of=10,                 # เพิ่มจาก 5 เป็น 10
-            temperature=0.0,            # ความมั่นใจสูงสุด
-            patience=2,                 # เพิ่ม patience เพื่อการค้นหาที่ดีขึ้น
-            length_penalty=1.0,         # ควบคุมความยาวของประโยค
-            repetition_penalty=1.1,     # ลดการพูดซ้ำ
-            no_repeat_ngram_size=2,     # ป้องกันคำซ้ำในระยะสั้น
-            suppress_blank=True,        # ลบช่วงว่าง
-            suppress_tokens=[-1],       # ลบ tokens ที่ไม่ต้องการ
-            without_timestamps=False,   # เก็บ timestamp ไว้เพื่อ debug
-            word_timestamps=True        # เพิ่ม word-level timestamps
-        )
-        
-        os.unlink(tmp_file_path)
-        
-        # รวมข้อความและทำความสะอาด
-        text = " ".join(segment.text.strip() for segment in segments if segment.text.strip()).strip()
-        
-        # ปรับแต่งข้อความเพิ่มเติม
-        text = clean_thai_text(text)
-        
-        return text
-        
+        audio, report = preprocess_audio(audio_bytes)
+    except AudioRejectedError as e:
+        st.warning(f"⚠️ {e}")
+        return ""
+    except Exception as e:
+        st.error(f"❌ ไม่สามารถอ่านไฟล์เสียงได้: {e}")
+        return ""
+    st.caption(
+        f"🎚️ เสียง {report['original_s']:.1f} วินาที ({report['sample_rate']} Hz, {report['channels']} ch) → "
+        f"ตัดเงียบหัว {report['trimmed_leading_s']:.1f} / ท้าย {report['trimmed_trailing_s']:.1f} วินาที "
+        f"เหลือ {report['final_s']:.1f} วินาที"
+    )
+    
+    # 2. ถอดเสียง
+    try:
+        text = service.transcribe(audio, tier=st.session_state.get('whisper_tier', DEFAULT_TIER))
+    except QueueFullError:
+        st.warning("⏳ มีคำขอถอดเสียงรอคิวอยู่มาก กรุณาลองใหม่อีกครั้งในไม่กี่วินาที")
+        return ""
+    except TranscriptionTimeoutError as e:
+        st.warning(f"⏳ {e}")
+        return ""
     except Exception as e:
         st.error(f"❌ เกิดข้อผิดพลาดในการถอดเสียง: {e}")
         return ""
+    
+    # ปรับแต่งข้อความเพิ่มเติม
+    return clean_thai_text(text)
 
 def clean_thai_text(text):
     """ทำความสะอาดข้อความภาษาไทยที่ได้จาก Whisper"""
@@ -128,11 +125,11 @@ def clean_thai_text(text):
 # ----> ฟังก์ชัน Callback ที่สร้างขึ้นมาใหม่ <----
 def handle_audio_upload():
     if 'audio_uploader' in st.session_state and st.session_state.audio_uploader is not None:
-        model = load_whisper_model()
-        if model:
+        service = load_transcription_service()
+        if service:
             with st.spinner("🔍 กำลังถอดเสียง..."):
                 audio_bytes = st.session_state.audio_uploader.read()
-                transcribed_text = transcribe_audio(audio_bytes, model)
+                transcribed_text = transcribe_audio(audio_bytes, service)
 
             if transcribed_text:
                 st.success(f"📝 ข้อความที่ถอดได้: '{transcribed_text}'")
@@ -144,81 +141,12 @@ def handle_audio_upload():
                 st.warning("⚠️ ไม่สามารถถอดข้อความจากไฟล์เสียงได้")
 
 # --- 1. ฐานข้อมูลความรู้ (Knowledge Base) และ Fuzzy Matching Logic ---
-CORRECT_LOCATIONS = [
-    # มหาวิทยาลัย
-    "มหาวิทยาลัยเทคโนโลยีพระจอมเกล้าพระนครเหนือ",
-    "มหาวิทยาลัยเกษตรศาสตร์",
-    "มหาวิทยาลัยกรุงเทพ",
-    "มหาวิทยาลัยชุลาลงกรณ์",
-    "มหาวิทยาลัยมหิดล",
-    "มหาวิทยาลัยธรรมศาสตร์",
-    "มหาวิทยาลัยรามคำแหง",
-    "มหาวิทยาลัยศรีนครินทรวิโรฒ",
-    "มอกะ", "เกษตร", "กทม",  # ชื่อเล่น
-    
-    # สนามบิน
-    "ท่าอากาศยานสุวรรณภูมิ",
-    "ท่าอากาศยานดอนเมือง",
-    "สนามบินสุวรรณภูมิ",
-    "สนามบินดอนเมือง",
-    
-    # สถานที่สำคัญ
-    "อนุสาวรีย์ชัยสมรภูมิ",
-    "อนุสาวรีย์ประชาธิปไตย",
-    "วัดพระแก้ว",
-    "วัดพอ",
-    "วัดอรุณ",
-    "วัดเบญจมบพิตร",
-    "วัดพระศรีรัตนศาสดาราม",
-    "วัดไตรมิตร",
-    "พระบรมมหาราชวัง",
-    
-    # สถานีการเดินทาง
-    "สถานีรถไฟฟ้าหัวลำโพง",
-    "สถานี BTS สยาม",
-    "สถานี MRT สุขุมวิท",
-    "สถานีรถไฟฟ้ากรุงเทพ",
-    "สถานีรถไฟฟ้าจตุจักร",
-    "สถานีรถไฟฟ้าพอพระราม สี่",
-    "สถานีรถไฟฟ้าพระน่องเกล้า",
-    
-    # สถานที่ราชการ
-    "พระบรมมหาราชวัง",
-    "พระราชวังบรรเจทพระบาทสมเด็จพระปกเกล้าฯ",
-    "ทำเนียบรัฐสภา",
-    "สำนักนายกรัฐมนตรี",
-    "กระทรวงการต่างประเทศ",
-    "กระทรวงกรุงเทพมหานคร",
-    
-    # ศูนย์การค้า
-    "พารากอน สยาม พารากอน",
-    "เซ็นทรัล เวิลด์",
-    "เอ็มบีเค",
-    "ไอคอน สยาม",
-    "เทอร์มินอล 21",
-    "มาบูญครอง สยาม",
-    "แพลตินัม แฟชั่น มอลล์",
-    
-    # โรงพยาบาล
-    "โรงพยาบาลจุฬาลงกรณ์",
-    "โรงพยาบาลศิริราช",
-    "โรงพยาบาลรามาธิบดี",
-    "โรงพยาบาลเวชศาสตร์",
-    
-    # สถานที่ท่องเที่ยว
-    "จังหวัดภูเก็ต",
-    "จังหวัดเชียงใหม่",
-    "จังหวัดขอนแก่น",
-    "จังหวัดสงขลา",
-    "จังหวัดสุราษฎร์ธานี",
-    "พัทยา", "เชียงใหม่", "ภูเก็ต"  # ชื่อสั้น
-]
+# ชื่อทางการและชื่อเล่น/alias ทั้งหมดมาจาก gazetteer (แหล่งเดียว) สคริปต์รันใหม่ทุก rerun จึงเห็นสถานที่ที่เพิ่มภายหลังด้วย
+CORRECT_LOCATIONS = list(dict.fromkeys(name for name, _ in gazetteer.iter_names()))
 THRESHOLD = 70  # ลดจาก 80 เป็น 70 เพื่อให้ยืดหยุ่นขึ้น
 
 def _normalize_text(text):
-    t = (text or "").strip().lower()
-    t = " ".join(t.split())
-    return t
+    return gazetteer.normalize_text(text)
 
 def extract_location_from_text(text):
     """ดึงชื่อสถานที่จากประโยคยาวๆ โดยใช้ pattern matching"""
@@ -255,22 +183,25 @@ def extract_location_from_text(text):
             if len(cleaned) > 3:  # กรองคำที่สั้นเกินไป
                 potential_locations.append(cleaned)
     
-    # 3. ใช้ pythainlp tokenize เพื่อหาคำนามเฉพาะ (ถ้ามี)
+    # 3. ใช้ tokenizer ที่รู้จักชื่อใน gazetteer (ชื่อสถานที่หลายคำจะออกมาเป็น token เดียว)
     if PYTHAINLP_AVAILABLE:
         try:
-            words = word_tokenize(text, engine='newmm')
-            # หาคำที่เป็นคำนามโดยดูจากคำเชื่อมโดยรอบ
+            words = thai_tokenizer.tokenize(text)
             for i, word in enumerate(words):
-                # หา compound words เช่น "มหาวิทยาลัย" + คำถัดไป
-                if word in ['มหาวิทยาลัย', 'สนามบิน', 'วัด', 'โรงพยาบาล', 'อนุสาวรีย์'] and i + 1 < len(words):
+                if thai_tokenizer.is_place_name(word):
+                    potential_locations.append(word)
+                # ชื่อที่ไม่อยู่ใน gazetteer: ต่อคำนำหน้ากับคำถัดไป เช่น "วัด" + "ชื่อวัด"
+                elif word in ['มหาวิทยาลัย', 'สนามบิน', 'วัด', 'โรงพยาบาล', 'อนุสาวรีย์'] and i + 1 < len(words):
                     compound = word + words[i + 1]
                     if len(compound) > 5:
                         potential_locations.append(compound)
         except:
             pass  # ถ้า tokenizer ล้มเหลวก็ข้ามไป
     
-    # ลบคำซ้ำ และ return แค่ unique values
-    return list(set(potential_locations))
+    # ลบคำซ้ำ แล้วเรียงให้แน่นอน (ไม่ขึ้นกับลำดับของ set): ชื่อที่รู้จักใน gazetteer ก่อน แล้วชื่อยาวก่อน
+    # เพื่อให้ "โรงพยาบาลจุฬาลงกรณ์" ชนะ alias สั้นที่เป็น substring ของมัน เช่น "จุฬา"
+    known = {_normalize_text(name) for name in CORRECT_LOCATIONS}
+    return sorted(set(potential_locations), key=lambda loc: (_normalize_text(loc) not in known, -len(loc), loc))
 
 def get_best_match(input_name, correct_list, threshold=THRESHOLD):
     """หา fuzzy match ที่ดีที่สุด - รองรับการค้นหาจากประโยคด้วย"""
@@ -278,7 +209,7 @@ def get_best_match(input_name, correct_list, threshold=THRESHOLD):
     extracted_locations = extract_location_from_text(input_name)
     if extracted_locations:
         st.info(f"🔍 พบสถานที่ในประโยค: {', '.join(extracted_locations)}")
-        # ใช้สถานที่แรกที่พบ
+        # ใช้สถานที่แรกที่พบ (ชื่อที่รู้จักและยาวที่สุด)
         input_name = extracted_locations[0]
     
     # 2. Fuzzy matching ตามปกติ
@@ -310,6 +241,59 @@ if 'latitude' not in st.session_state:
     st.session_state['address'] = None
     st.session_state['user_input'] = None
     st.session_state['location_input'] = ""
+if 'pending_location_input' in st.session_state:
+    st.session_state['location_input'] = st.session_state.pop('pending_location_input')
+if 'waypoints' not in st.session_state:
+    st.session_state['waypoints'] = []
+    st.session_state['route_order'] = []
+    st.session_state['route_length_m'] = 0.0
+
+# GEOCODER_PROVIDER=offline ใช้ gazetteer ในเครื่องแทน API (สำหรับ load test / ไม่มีอินเทอร์เน็ต)
+GEOCODER_PROVIDER = os.environ.get("GEOCODER_PROVIDER", "online")
+
+def _lookup_poi(clean_query):
+    """ค้นชื่อตรงตัวใน POI index (ถ้ามีไฟล์ ดู poi_ingest.py) คืน OfflineLocation หรือ None ถ้าไม่พบ/กำกวม"""
+    try:
+        index = poi_index.get_default_index()
+    except (OSError, ValueError):
+        return None
+    if index is None:
+        return None
+    match = index.lookup_unique(clean_query)  # ชื่อที่ซ้ำหลายแห่งให้ provider ตัดสินแทน
+    if match is None:
+        return None
+    name, lat, lon = match
+    return OfflineLocation(lat, lon, name)
+
+def _geocoder_providers():
+    """provider ตามลำดับที่ใช้ค้นจริง (ชื่อ -> geocoder) ใช้ร่วมกันระหว่างการค้นของผู้ใช้และตัวอุ่นแคช"""
+    if GEOCODER_PROVIDER == "offline":
+        return {"offline": OfflineGeocoder()}
+    return {
+        "arcgis": ArcGIS(user_agent="arcgis_fuzzy_app_v2"),
+        "nominatim": Nominatim(user_agent="nominatim_fuzzy_app_v2"),
+    }
+
+# อุ่นแคชพิกัดของทุกสถานที่ใน gazetteer เบื้องหลัง (เริ่มครั้งเดียวต่อ process, ปิดด้วย GEOCODE_WARMER_ENABLED=0)
+geocode_cache.start_warmer(_geocoder_providers())
+
+# ค้นหาพิกัด: แคช/gazetteer และ POI index ในเครื่องก่อน แล้วค่อยถาม API (ArcGIS แล้ว Nominatim)
+# ไม่แตะ st เพื่อให้เรียกจาก thread อื่นได้
+def _geocode_query(clean_query):
+    cache = geocode_cache.get_default_cache()
+    location = cache.lookup(clean_query)
+    if location:
+        return location
+    location = _lookup_poi(clean_query)
+    if location:
+        return location
+    for provider, geolocator in _geocoder_providers().items():
+        geocode_cache.rate_limiter(provider).wait()
+        location = geolocator.geocode(clean_query, timeout=10)
+        if location:
+            cache.remember(clean_query, location, provider)
+            return location
+    return None
 
 # ฟังก์ชัน Geocoding ที่จะบันทึกผลลัพธ์ลง session_state
 def geocode_location(location_to_search, user_input):
@@ -319,13 +303,9 @@ def geocode_location(location_to_search, user_input):
         return
 
     st.info(f"🚀 กำลังค้นหาพิกัดของ: **{clean_query}**")
-    geolocator_arcgis = ArcGIS(user_agent="arcgis_fuzzy_app_v2")
-    geolocator_nominatim = Nominatim(user_agent="nominatim_fuzzy_app_v2")
     location = None
     try:
-        location = geolocator_arcgis.geocode(clean_query, timeout=10)
-        if not location:
-            location = geolocator_nominatim.geocode(clean_query, timeout=10)
+        location = _geocode_query(clean_query)
     except Exception as e:
         st.error(f"🚨 ข้อผิดพลาดในการติดต่อ API: โปรดตรวจสอบอินเทอร์เน็ต ({e})")
         st.session_state['latitude'] = None
@@ -341,7 +321,31 @@ def geocode_location(location_to_search, user_input):
         st.warning(f"🚨 ไม่พบพิกัดสำหรับ '{clean_query}'")
         st.session_state['latitude'] = None
 
+# ฟังก์ชัน Reverse Geocoding: พิกัด -> ชื่อสถานที่ (ใช้ spatial index ก่อน แล้วค่อยถาม API)
+REVERSE_MAX_DISTANCE_M = 500  # ระยะสูงสุดที่ถือว่า "อยู่ที่" สถานที่ที่รู้จัก
+
+def reverse_geocode(lat, lon, max_distance_m=REVERSE_MAX_DISTANCE_M):
+    """คืน (ชื่อสถานที่, ระยะทางเมตร หรือ None, แหล่งที่มา) หรือ None ถ้าไม่พบ"""
+    offline = spatial_index.reverse_geocode_offline(lat, lon, max_distance_m)
+    if offline:
+        name, _, _, distance_m = offline
+        return name, distance_m, "gazetteer"
+    if GEOCODER_PROVIDER == "offline":
+        return None
+
+    geolocator_nominatim = Nominatim(user_agent="nominatim_fuzzy_app_v2")
+    geocode_cache.rate_limiter("nominatim").wait()  # ใช้โควตาเดียวกับการค้นและตัวอุ่นแคช
+    try:
+        location = geolocator_nominatim.reverse((lat, lon), timeout=10, language="th")
+    except Exception as e:
+        st.error(f"🚨 ข้อผิดพลาดในการติดต่อ API: โปรดตรวจสอบอินเทอร์เน็ต ({e})")
+        return None
+    if location:
+        return location.address, None, "nominatim"
+    return None
+
 # ฟังก์ชันกลางสำหรับประมวลผลและค้นหา
+@request_profiler.profiled("process_and_search", force=_profile_flag)
 def process_and_search(user_input):
     if not (user_input or "").strip():
         st.warning("โปรดป้อนชื่อสถานที่ก่อนค้นหา")
@@ -360,6 +364,121 @@ def process_and_search(user_input):
     # 4. ค้นหาพิกัดเสมอ! (เอาออกมานอก if/else แล้ว)
     geocode_location(location_to_search, user_input)
 
+# --- ส่งออกไฟล์ภารกิจ (GeoJSON / KML / CSV / QGroundControl) ---
+EXPORT_LABELS = {
+    "geojson": "GeoJSON",
+    "kml": "KML (Google Earth)",
+    "csv": "CSV",
+    "plan": "QGroundControl .plan",
+    "waypoints": "MAVLink .waypoints (QGC WPL 110)",
+}
+
+def render_export_controls(points, key_prefix, file_stem):
+    """ปุ่มดาวน์โหลดผลลัพธ์ ไฟล์ถูกสร้างตอนกดปุ่ม (นอก script rerun) จึงไม่ทำให้หน้าค้าง"""
+    col_fmt, col_download = st.columns([2, 1])
+    with col_fmt:
+        fmt = st.selectbox(
+            "💾 ส่งออกเป็น", list(EXPORT_LABELS), format_func=EXPORT_LABELS.get, key=f"{key_prefix}_export_format"
+        )
+    _, extension, mime = mission_export.EXPORT_FORMATS[fmt]
+    points = list(points)  # snapshot เพราะ callable ทำงานใน thread อื่นหลัง session_state อาจเปลี่ยนแล้ว
+    with col_download:
+        st.download_button(
+            "⬇️ ดาวน์โหลด",
+            data=lambda: mission_export.export_to_bytes(fmt, points),
+            file_name=f"{file_stem}.{extension}",
+            mime=mime,
+            key=f"{key_prefix}_export_download",
+            use_container_width=True,
+        )
+
+# --- คำแนะนำขณะพิมพ์ (Type-ahead) ---
+# เลือกคำแนะนำแล้วได้ชื่อทางการทันที จึงข้ามขั้นตอนแยกคำและ fuzzy matching ทั้งหมด
+SUGGESTION_LIMIT = 5
+
+def _pick_suggestion(suggestion):
+    # callback ของปุ่มทำงานก่อน widget ถูกสร้างใหม่ จึงแก้ค่า location_input ได้
+    st.session_state.location_input = suggestion.name
+    st.session_state['picked_suggestion'] = suggestion
+
+def apply_suggestion(suggestion):
+    if suggestion.source == "poi" and suggestion.latitude is not None:
+        # แถว POI ที่ผู้ใช้เลือกมีพิกัดของตัวเองอยู่แล้ว (ชื่อซ้ำได้หลายแห่ง) จึงใช้ตรงๆ ไม่ค้นจากชื่ออีกรอบ
+        latitude, longitude, address = suggestion.latitude, suggestion.longitude, suggestion.name
+    else:
+        # ชื่อใน gazetteer ใช้พิกัดจากแคช (ที่ตัวอุ่นแคชตรวจกับ provider แล้ว) เหมือนการค้นปกติ
+        location = geocode_cache.get_default_cache().lookup(suggestion.name)
+        if location is None:
+            geocode_location(suggestion.name, suggestion.name)
+            return
+        latitude, longitude, address = location.latitude, location.longitude, location.address
+    st.success(f"✅ เลือกจากคำแนะนำ: **{suggestion.name}**")
+    st.session_state['latitude'] = latitude
+    st.session_state['longitude'] = longitude
+    st.session_state['address'] = address
+    st.session_state['user_input'] = suggestion.name
+
+# --- โหมดหลายจุดหมาย (Multi-waypoint) ---
+# คำเชื่อมที่ใช้แยกจุดหมายในประโยค เช่น "ไปวัดพระแก้ว แล้วไปวัดอรุณ แล้วไปไอคอน สยาม"
+WAYPOINT_SEPARATOR_PATTERN = re.compile(
+    r'\s*(?:แล้วก็ไป|แล้วไป|แล้ว|จากนั้นไป|จากนั้น|ต่อด้วย|ต่อไป|และ|,|->|→)\s*'
+)
+WAYPOINT_LEADING_VERBS = re.compile(r'^(?:ฉัน)?(?:ต้องการ|อยาก)?(?:บิน)?(?:ไป(?!รษณีย์)|ที่)\s*')
+GEOCODE_MAX_WORKERS = 4  # จำกัดจำนวน request พร้อมกันไม่ให้เกิน rate limit ของ provider
+
+def extract_waypoints(text):
+    """แยกประโยคเป็นรายชื่อจุดหมายตามลำดับที่พูด (แก้คำผิดด้วย fuzzy matching ทีละจุด)"""
+    waypoints = []
+    for segment in WAYPOINT_SEPARATOR_PATTERN.split(_normalize_text(text)):
+        segment = WAYPOINT_LEADING_VERBS.sub('', segment.strip()).strip()
+        if not segment:
+            continue
+        extracted = extract_location_from_text(segment)
+        candidate = max(extracted, key=len) if extracted else segment
+        result = rf_process.extractOne(candidate, CORRECT_LOCATIONS, scorer=rf_fuzz.token_set_ratio)
+        name = result[0] if result and result[1] >= THRESHOLD else candidate
+        if not waypoints or waypoints[-1] != name:
+            waypoints.append(name)
+    return waypoints
+
+def _geocode_waypoint(name):
+    try:
+        location = _geocode_query(name)
+    except Exception as e:
+        return {"name": name, "error": str(e)}
+    if not location:
+        return {"name": name, "error": "not found"}
+    return {"name": name, "latitude": location.latitude, "longitude": location.longitude, "address": location.address}
+
+@request_profiler.profiled("process_multi_waypoint", force=_profile_flag)
+def process_multi_waypoint(user_input):
+    """ค้นหาพิกัดทุกจุดหมายพร้อมกัน แล้วเรียงลำดับการบินให้ระยะทางรวมสั้นที่สุด (จุดแรกคงที่)"""
+    names = extract_waypoints(user_input)
+    if not names:
+        st.warning("โปรดป้อนชื่อสถานที่ก่อนค้นหา")
+        return
+    st.info(f"🔍 พบ {len(names)} จุดหมาย: {' → '.join(names)}")
+
+    with st.spinner("🚀 กำลังค้นหาพิกัดทุกจุดพร้อมกัน..."):
+        with ThreadPoolExecutor(max_workers=min(GEOCODE_MAX_WORKERS, len(names))) as executor:
+            results = list(executor.map(_geocode_waypoint, names))
+
+    waypoints = [r for r in results if "error" not in r]
+    for r in results:
+        if "error" in r:
+            st.warning(f"🚨 ไม่พบพิกัดสำหรับ '{r['name']}' ({r['error']})")
+    if not waypoints:
+        st.session_state['waypoints'] = []
+        st.session_state['route_order'] = []
+        return
+
+    coords = [(w["latitude"], w["longitude"]) for w in waypoints]
+    route, total_m, _ = mission_planner.plan_route(coords, start=0)
+    st.session_state['waypoints'] = waypoints
+    st.session_state['route_order'] = route
+    st.session_state['route_length_m'] = total_m
+    st.success(f"✅ วางเส้นทาง {len(waypoints)} จุดแล้ว (ระยะทางรวม {total_m / 1000:.2f} กม.)")
+
 col1, col2 = st.columns([1, 1])
 
 # คอลัมน์ซ้าย: อินพุตและผลลัพธ์ตัวเลข
@@ -388,8 +507,32 @@ with col1:
         help="สามารถพิมพ์ชื่อย่อ หรือพิมพ์ประโยคยาวๆ เช่น 'ฉันต้องการไปมหาวิทยาลัยกรุงเทพ'"
     )
 
+    multi_waypoint = st.checkbox(
+        "🧭 โหมดหลายจุดหมาย (เช่น 'ไปวัดพระแก้ว แล้วไปวัดอรุณ แล้วไปไอคอน สยาม')",
+        key="multi_waypoint"
+    )
+
+    # ไม่ต้องแนะนำเมื่อช่องค้นหาเป็นชื่อทางการอยู่แล้ว (เช่น หลังเลือกคำแนะนำ)
+    if typed_input and not multi_waypoint and typed_input.strip() not in gazetteer.GAZETTEER:
+        suggestions = suggest.suggest(typed_input, SUGGESTION_LIMIT)
+        if suggestions:
+            st.caption("💡 คำแนะนำ:")
+            suggestion_cols = st.columns(len(suggestions))
+            for i, (col, suggestion) in enumerate(zip(suggestion_cols, suggestions)):
+                col.button(
+                    suggest.suggestion_label(suggestion, suggestions), key=f"suggestion_{i}", help=f"ตรงกับ '{suggestion.matched}'",
+                    on_click=_pick_suggestion, args=(suggestion,), use_container_width=True
+                )
+
+    picked_suggestion = st.session_state.pop('picked_suggestion', None)
+    if picked_suggestion:
+        apply_suggestion(picked_suggestion)
+
     if st.button("🔎 ค้นหาพิกัด", use_container_width=True):
-        process_and_search(typed_input)
+        if multi_waypoint:
+            process_multi_waypoint(typed_input)
+        else:
+            process_and_search(typed_input)
     
     st.markdown("**หรือ** บันทึก/อัปโหลดไฟล์เสียง")
     
@@ -406,17 +549,24 @@ with col1:
             sample_rate=16000
         )
         
-        if audio_bytes:
+        # component คืนเสียงเดิมซ้ำทุก rerun จึงถอดเสียงเฉพาะคลิปที่ยังไม่เคยประมวลผล
+        recording_digest = hashlib.sha1(audio_bytes).hexdigest() if audio_bytes else None
+        if audio_bytes and recording_digest != st.session_state.get('last_recording_digest'):
+            st.session_state['last_recording_digest'] = recording_digest
             st.success("✅ บันทึกเสียงสำเร็จ! กำลังถอดเสียง...")
-            model = load_whisper_model()
-            if model:
+            service = load_transcription_service()
+            if service:
                 with st.spinner("🔍 กำลังถอดเสียง..."):
-                    transcribed_text = transcribe_audio(audio_bytes, model)
+                    transcribed_text = transcribe_audio(audio_bytes, service)
 
                 if transcribed_text:
                     st.success(f"📝 ข้อความที่ถอดได้: **{transcribed_text}**")
-                    st.session_state.location_input = transcribed_text
-                    process_and_search(transcribed_text)
+                    # แก้ค่า widget ที่สร้างไปแล้วในรอบนี้ไม่ได้ จึงฝากไว้ให้รอบถัดไปใส่ก่อนสร้าง text_input
+                    st.session_state['pending_location_input'] = transcribed_text
+                    if multi_waypoint:
+                        process_multi_waypoint(transcribed_text)
+                    else:
+                        process_and_search(transcribed_text)
                     st.rerun()
                 else:
                     st.warning("⚠️ ไม่สามารถถอดข้อความจากเสียงที่บันทึกได้")
@@ -449,8 +599,49 @@ with col1:
         coordinates_text = f"{st.session_state.latitude}, {st.session_state.longitude}"
         st.code(f"Google Maps: https://maps.google.com/?q={coordinates_text}", language="text")
         st.code(f"Drone Coordinates: {coordinates_text}", language="text")
+        render_export_controls(
+            [{
+                "name": st.session_state.user_input or st.session_state.address,
+                "latitude": st.session_state.latitude,
+                "longitude": st.session_state.longitude,
+                "address": st.session_state.address,
+            }],
+            key_prefix="single", file_stem="drone_target",
+        )
+
+    if multi_waypoint and st.session_state.route_order:
+        st.subheader("🧭 ลำดับการบิน")
+        for step, idx in enumerate(st.session_state.route_order, start=1):
+            w = st.session_state.waypoints[idx]
+            st.markdown(f"**{step}. {w['name']}** — `{w['latitude']:.6f}, {w['longitude']:.6f}`")
+        st.caption(f"ระยะทางรวมโดยประมาณ: {st.session_state.route_length_m / 1000:.2f} กม.")
+        render_export_controls(
+            (st.session_state.waypoints[i] for i in st.session_state.route_order),
+            key_prefix="route", file_stem="drone_mission",
+        )
 
     st.subheader("2. ฟังก์ชันเสริมโครงการโดรน")
+
+    st.markdown("🛰️ **ตำแหน่งโดรนอยู่ใกล้ที่ไหน?** (Reverse Geocoding)")
+    col_rlat, col_rlon = st.columns(2)
+    with col_rlat:
+        drone_lat = st.number_input("ละติจูดของโดรน", value=13.7563, format="%.6f", key="drone_lat")
+    with col_rlon:
+        drone_lon = st.number_input("ลองจิจูดของโดรน", value=100.5018, format="%.6f", key="drone_lon")
+    if st.button("📍 ค้นหาสถานที่จากพิกัด", use_container_width=True):
+        reverse_result = reverse_geocode(drone_lat, drone_lon)
+        if reverse_result:
+            place_name, distance_m, source = reverse_result
+            if distance_m is not None:
+                st.success(f"✅ โดรนอยู่ที่ **{place_name}** (ห่าง {distance_m:.0f} ม., จาก {source})")
+            else:
+                st.success(f"✅ โดรนอยู่ที่ **{place_name}** (จาก {source})")
+        else:
+            st.warning("🚨 ไม่พบสถานที่ใกล้พิกัดนี้")
+        nearby = spatial_index.nearest_places(drone_lat, drone_lon, k=3)
+        if nearby:
+            st.caption("สถานที่ที่รู้จักใกล้ที่สุด: " + ", ".join(f"{n} ({d / 1000:.2f} กม.)" for n, _, _, d in nearby))
+
     uploaded_image = st.file_uploader("📷 อัปโหลดภาพโดรนเพื่อยืนยันภารกิจ", type=["jpg", "jpeg", "png"])
     if uploaded_image:
         try:
@@ -458,10 +649,72 @@ with col1:
         except Exception as e:
             st.error(f"ไม่สามารถแสดงภาพที่อัปโหลดได้: {e}")
 
+# แถบด้านข้าง: สถานะคิวถอดเสียง (แสดงเมื่อ worker เริ่มทำงานแล้ว)
+st.sidebar.radio(
+    "🎙️ โหมดถอดเสียง",
+    options=["accurate", "fast"],
+    index=0 if DEFAULT_TIER == "accurate" else 1,
+    format_func=lambda tier: "แม่นยำ (โมเดลใหญ่ ระหว่างโหลดจะตอบด้วยโมเดลเล็ก)" if tier == "accurate" else "เร็ว (โมเดลเล็ก int8)",
+    key="whisper_tier"
+)
+
+with st.sidebar.expander("📊 สถานะคิวถอดเสียง"):
+    services = running_services()
+    if not services:
+        st.caption("ยังไม่ได้เริ่ม worker ถอดเสียง")
+    for service_metrics in (service.metrics() for service in services):
+        st.metric("คิวที่รออยู่", f"{service_metrics['queue_depth']} / {service_metrics['queue_capacity']}")
+        st.caption(
+            f"กำลังถอดเสียง {service_metrics['running']} | "
+            f"worker {service_metrics['workers_alive']}/{service_metrics['workers']} x {service_metrics['cpu_threads']} threads | "
+            f"สำเร็จ {service_metrics['completed']} | ปฏิเสธ {service_metrics['rejected']} | "
+            f"หมดเวลา {service_metrics['timed_out']} | เฉลี่ย {service_metrics['avg_decode_s']:.2f} วินาที"
+        )
+        for worker_id, report in sorted(service_metrics['models'].items()):
+            st.caption(
+                f"worker {worker_id}: ใช้ {report['used_mb']:.0f} / {report['budget_mb']:.0f} MB "
+                f"(RSS {report['process_rss_mb']:.0f} MB)"
+            )
+            if report.get('loading'):
+                st.caption(f"⏳ กำลังโหลด {report['loading']} เบื้องหลัง (ระหว่างนี้ใช้โมเดลเล็ก)")
+            for model_key, info in report['models'].items():
+                pin = " 📌" if info['pinned'] else ""
+                st.caption(f"• {model_key}{pin}: {info['resident_mb']:.0f} MB, idle {info['idle_s']:.0f} วินาที")
+
+with st.sidebar.expander("🗄️ แคชพิกัด"):
+    cache_stats = geocode_cache.get_default_cache().stats()
+    st.metric("สถานที่ในแคช", f"{cache_stats['verified']} / {cache_stats['entries']} ตรวจแล้ว")
+    st.caption(
+        f"ตอบจากแคช {cache_stats['hits']} | จาก gazetteer {cache_stats['gazetteer_hits']} | "
+        f"ต้องถาม API {cache_stats['misses']} | provider ไม่ตรงกัน {cache_stats['disagree']}"
+    )
+    warmer = geocode_cache.get_warmer()
+    if warmer is None:
+        st.caption("ตัวอุ่นแคชปิดอยู่ (GEOCODE_WARMER_ENABLED=0)")
+    else:
+        st.caption(f"อุ่นแคชแล้ว {warmer.passes} รอบ" + (f" (รอบล่าสุด {warmer.last_pass_s:.0f} วินาที)" if warmer.last_pass_s else ""))
+
 # คอลัมน์ขวา: แผนที่
 with col2:
     st.subheader("แผนที่")
-    if st.session_state.latitude:
+    if multi_waypoint and st.session_state.route_order:
+        ordered = [st.session_state.waypoints[i] for i in st.session_state.route_order]
+        path = [[w["latitude"], w["longitude"]] for w in ordered]
+        m = folium.Map(location=path[0], zoom_start=13)
+        for step, w in enumerate(ordered, start=1):
+            folium.Marker(
+                location=[w["latitude"], w["longitude"]],
+                popup=f"📍 **{w['address']}**",
+                tooltip=f"{step}. {w['name']}"
+            ).add_to(m)
+        if len(path) > 1:
+            folium.PolyLine(path, weight=3).add_to(m)
+            m.fit_bounds(path)
+        if st_folium:
+            st_folium(m, width=700, height=500)
+        else:
+            st.warning("ไม่พบไลบรารี streamlit-folium กรุณาติดตั้ง")
+    elif st.session_state.latitude:
         m = folium.Map(location=[st.session_state.latitude, st.session_state.longitude], zoom_start=15)
         folium.Marker(
             location=[st.session_state.latitude, st.session_state.longitude],
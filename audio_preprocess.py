@@ -0,0 +1,150 @@
+# --- ขั้นตอนเตรียมเสียงก่อนถอดความ (Audio Preprocessing) ---
+# decode -> downmix เป็น mono -> resample เป็น 16 kHz -> ตัดเสียงเงียบหัวท้ายด้วยพลังงาน
+# -> ปฏิเสธคลิปที่ว่าง/สั้นเกินไปก่อนส่งเข้าโมเดล (ไม่ต้องเสียเวลา beam search กับความเงียบ)
+# ผลลัพธ์เป็น float32 16 kHz mono ที่ faster-whisper รับได้โดยตรง พร้อม report ว่าแต่ละขั้นตัดไปเท่าไร
+import io
+import wave
+
+import numpy as np
+
+try:
+    import av
+    PYAV_AVAILABLE = True
+except ImportError:
+    PYAV_AVAILABLE = False
+
+TARGET_SAMPLE_RATE = 16000
+FRAME_S = 0.02              # ขนาดเฟรมสำหรับคำนวณพลังงาน
+SILENCE_REL_DB = -35.0      # เฟรมที่เบากว่าเฟรมที่ดังที่สุดเกินค่านี้ถือเป็นความเงียบ
+SILENCE_ABS_DB = -55.0      # และเฟรมที่เบากว่าระดับนี้ (dBFS) เป็นความเงียบเสมอ
+KEEP_PADDING_S = 0.2        # เผื่อเสียงหัวท้ายไว้ไม่ให้ตัดพยัญชนะต้น/ท้าย
+MIN_SPEECH_S = 0.3          # สั้นกว่านี้หลังตัดเงียบถือว่าไม่มีคำพูด
+
+
+class AudioRejectedError(Exception):
+    """คลิปเสียงว่างหรือสั้นเกินไป ไม่ต้องส่งเข้าโมเดล (report อยู่ใน .report)"""
+
+    def __init__(self, message, report):
+        super().__init__(message)
+        self.report = report
+
+
+def _decode_wav(audio_bytes):
+    with wave.open(io.BytesIO(audio_bytes), "rb") as wav:
+        channels, width, rate = wav.getnchannels(), wav.getsampwidth(), wav.getframerate()
+        raw = wav.readframes(wav.getnframes())
+    if width == 1:
+        samples = (np.frombuffer(raw, dtype=np.uint8).astype(np.float32) - 128.0) / 128.0
+    elif width == 2:
+        samples = np.frombuffer(raw, dtype="<i2").astype(np.float32) / 32768.0
+    elif width == 3:
+        b = np.frombuffer(raw, dtype=np.uint8).reshape(-1, 3).astype(np.int32)
+        ints = (b[:, 0] | (b[:, 1] << 8) | (b[:, 2] << 16))
+        ints = np.where(ints & 0x800000, ints - 0x1000000, ints)
+        samples = ints.astype(np.float32) / 8388608.0
+    elif width == 4:
+        samples = np.frombuffer(raw, dtype="<i4").astype(np.float32) / 2147483648.0
+    else:
+        raise ValueError(f"ไม่รองรับ WAV ขนาด sample {width} bytes")
+    return samples.reshape(-1, channels), rate
+
+
+def _decode_av(audio_bytes):
+    if not PYAV_AVAILABLE:
+        raise ValueError("ต้องติดตั้ง PyAV เพื่อ decode ไฟล์ที่ไม่ใช่ WAV")
+    chunks, rate = [], None
+    with av.open(io.BytesIO(audio_bytes), mode="r") as container:
+        stream = container.streams.audio[0]
+        rate = stream.codec_context.sample_rate
+        resampler = av.AudioResampler(format="fltp", layout=stream.codec_context.layout, rate=rate)
+        for frame in container.decode(stream):
+            for out in resampler.resample(frame):
+                chunks.append(out.to_ndarray())
+    if not chunks:
+        return np.zeros((0, 1), dtype=np.float32), rate or TARGET_SAMPLE_RATE
+    # fltp = planar float: (channels, samples)
+    return np.concatenate(chunks, axis=1).T.astype(np.float32), rate
+
+
+def decode(audio_bytes):
+    """คืน (samples float32 รูป (n, channels), sample_rate)"""
+    if audio_bytes[:4] == b"RIFF" and audio_bytes[8:12] == b"WAVE":
+        try:
+            return _decode_wav(audio_bytes)
+        except (wave.Error, ValueError, EOFError):
+            pass  # WAV แบบ float/extensible ที่ wave อ่านไม่ได้ ให้ PyAV ลองต่อ
+    return _decode_av(audio_bytes)
+
+
+def downmix(samples):
+    if samples.ndim == 1:
+        return samples
+    return samples.mean(axis=1, dtype=np.float32)
+
+
+def _lowpass(samples, cutoff_ratio, taps=63):
+    """FIR windowed-sinc (Hann) ตัดความถี่เกิน cutoff_ratio x Nyquist ก่อน downsample กัน aliasing"""
+    n = np.arange(taps) - (taps - 1) / 2.0
+    kernel = cutoff_ratio * np.sinc(cutoff_ratio * n) * np.hanning(taps)
+    kernel /= kernel.sum()
+    return np.convolve(samples, kernel.astype(np.float32), mode="same")
+
+
+def resample(samples, rate, target_rate=TARGET_SAMPLE_RATE):
+    if rate == target_rate or len(samples) == 0:
+        return samples.astype(np.float32, copy=False)
+    if target_rate < rate:
+        samples = _lowpass(samples, target_rate / rate)
+    n_out = int(round(len(samples) * target_rate / rate))
+    src_t = np.arange(len(samples), dtype=np.float64) / rate
+    dst_t = np.arange(n_out, dtype=np.float64) / target_rate
+    return np.interp(dst_t, src_t, samples).astype(np.float32)
+
+
+def trim_silence(samples, rate=TARGET_SAMPLE_RATE):
+    """ตัดเสียงเงียบหัวท้าย คืน (samples ที่ตัดแล้ว, จำนวน sample ที่ตัดหัว, จำนวนที่ตัดท้าย)"""
+    frame = max(1, int(rate * FRAME_S))
+    n_frames = len(samples) // frame
+    if n_frames == 0:
+        return samples[:0], 0, len(samples)
+    frames = samples[:n_frames * frame].reshape(n_frames, frame)
+    rms = np.sqrt(np.mean(frames.astype(np.float64) ** 2, axis=1))
+    db = 20.0 * np.log10(np.maximum(rms, 1e-10))
+    threshold = max(db.max() + SILENCE_REL_DB, SILENCE_ABS_DB)
+    voiced = np.flatnonzero(db > threshold)
+    if len(voiced) == 0:
+        return samples[:0], 0, len(samples)
+    pad = int(rate * KEEP_PADDING_S)
+    start = max(0, voiced[0] * frame - pad)
+    end = min(len(samples), (voiced[-1] + 1) * frame + pad)
+    return samples[start:end], int(start), int(len(samples) - end)
+
+
+def preprocess(audio_bytes):
+    """เตรียมเสียงสำหรับ Whisper คืน (float32 16 kHz mono, report) หรือ raise AudioRejectedError"""
+    report = {"input_bytes": len(audio_bytes or b"")}
+    if not audio_bytes:
+        raise AudioRejectedError("ไฟล์เสียงว่าง", report)
+
+    samples, rate = decode(audio_bytes)
+    report.update(
+        sample_rate=rate,
+        channels=samples.shape[1] if samples.ndim > 1 else 1,
+        original_s=len(samples) / rate if rate else 0.0,
+    )
+    mono = downmix(samples)
+    audio = resample(mono, rate)
+    report["resampled_s"] = len(audio) / TARGET_SAMPLE_RATE
+
+    trimmed, lead, tail = trim_silence(audio)
+    report.update(
+        trimmed_leading_s=lead / TARGET_SAMPLE_RATE,
+        trimmed_trailing_s=tail / TARGET_SAMPLE_RATE,
+        final_s=len(trimmed) / TARGET_SAMPLE_RATE,
+    )
+    report["removed_s"] = report["original_s"] - report["final_s"]
+    if len(trimmed) == 0:
+        raise AudioRejectedError("ไม่พบเสียงพูดในคลิป (เงียบทั้งคลิป)", report)
+    if report["final_s"] < MIN_SPEECH_S:
+        raise AudioRejectedError(f"คลิปสั้นเกินไป ({report['final_s']:.2f} วินาที)", report)
+    return trimmed, report
@@ -0,0 +1,137 @@
+# --- ฐานข้อมูลสถานที่พร้อมพิกัด (Gazetteer) ---
+# ชื่อทางการ -> พิกัดโดยประมาณ และชื่อเรียกอื่น (alias)
+# สถานที่ที่ยังไม่ทราบพิกัดแน่ชัดให้ใส่ lat/lon เป็น None (ใช้ค้นชื่อได้ แต่ไม่อยู่ใน spatial index)
+import math
+import threading
+
+GAZETTEER = {
+    # มหาวิทยาลัย
+    "มหาวิทยาลัยเทคโนโลยีพระจอมเกล้าพระนครเหนือ": {"lat": 13.8190, "lon": 100.5143, "aliases": ["มอกะ", "มจพ"]},
+    "มหาวิทยาลัยเกษตรศาสตร์": {"lat": 13.8476, "lon": 100.5696, "aliases": ["เกษตร"]},
+    "มหาวิทยาลัยกรุงเทพ": {"lat": 14.0393, "lon": 100.6137, "aliases": []},
+    "มหาวิทยาลัยชุลาลงกรณ์": {"lat": 13.7384, "lon": 100.5320, "aliases": ["จุฬาลงกรณ์มหาวิทยาลัย", "จุฬา"]},
+    "มหาวิทยาลัยมหิดล": {"lat": 13.7946, "lon": 100.3234, "aliases": []},
+    "มหาวิทยาลัยธรรมศาสตร์": {"lat": 13.7567, "lon": 100.4906, "aliases": []},
+    "มหาวิทยาลัยรามคำแหง": {"lat": 13.7570, "lon": 100.6186, "aliases": []},
+    "มหาวิทยาลัยศรีนครินทรวิโรฒ": {"lat": 13.7448, "lon": 100.5650, "aliases": []},
+
+    # สนามบิน
+    "ท่าอากาศยานสุวรรณภูมิ": {"lat": 13.6900, "lon": 100.7501, "aliases": ["สนามบินสุวรรณภูมิ", "สุวรรณภูมิ"]},
+    "ท่าอากาศยานดอนเมือง": {"lat": 13.9126, "lon": 100.6068, "aliases": ["สนามบินดอนเมือง", "ดอนเมือง"]},
+
+    # สถานที่สำคัญ
+    "อนุสาวรีย์ชัยสมรภูมิ": {"lat": 13.7649, "lon": 100.5383, "aliases": []},
+    "อนุสาวรีย์ประชาธิปไตย": {"lat": 13.7567, "lon": 100.5018, "aliases": []},
+    "วัดพระแก้ว": {"lat": 13.7516, "lon": 100.4927, "aliases": ["วัดพระศรีรัตนศาสดาราม"]},
+    "วัดพอ": {"lat": 13.7465, "lon": 100.4930, "aliases": ["วัดโพธิ์"]},
+    "วัดอรุณ": {"lat": 13.7437, "lon": 100.4888, "aliases": []},
+    "วัดเบญจมบพิตร": {"lat": 13.7664, "lon": 100.5141, "aliases": []},
+    "วัดไตรมิตร": {"lat": 13.7378, "lon": 100.5135, "aliases": []},
+    "พระบรมมหาราชวัง": {"lat": 13.7500, "lon": 100.4913, "aliases": []},
+
+    # สถานีการเดินทาง
+    "สถานีรถไฟฟ้าหัวลำโพง": {"lat": 13.7393, "lon": 100.5170, "aliases": []},
+    "สถานี BTS สยาม": {"lat": 13.7456, "lon": 100.5341, "aliases": []},
+    "สถานี MRT สุขุมวิท": {"lat": 13.7380, "lon": 100.5610, "aliases": []},
+    "สถานีรถไฟฟ้ากรุงเทพ": {"lat": 13.8035, "lon": 100.5409, "aliases": []},
+    "สถานีรถไฟฟ้าจตุจักร": {"lat": 13.8030, "lon": 100.5537, "aliases": []},
+    "สถานีรถไฟฟ้าพอพระราม สี่": {"lat": None, "lon": None, "aliases": []},
+    "สถานีรถไฟฟ้าพระน่องเกล้า": {"lat": None, "lon": None, "aliases": []},
+
+    # สถานที่ราชการ
+    "พระราชวังบรรเจทพระบาทสมเด็จพระปกเกล้าฯ": {"lat": None, "lon": None, "aliases": []},
+    "ทำเนียบรัฐสภา": {"lat": 13.7890, "lon": 100.5186, "aliases": []},
+    "สำนักนายกรัฐมนตรี": {"lat": 13.7631, "lon": 100.5147, "aliases": []},
+    "กระทรวงการต่างประเทศ": {"lat": 13.7628, "lon": 100.5309, "aliases": []},
+    "กระทรวงกรุงเทพมหานคร": {"lat": 13.7527, "lon": 100.5010, "aliases": []},
+    "กรุงเทพมหานคร": {"lat": 13.7563, "lon": 100.5018, "aliases": ["กทม"]},
+
+    # ศูนย์การค้า
+    "พารากอน สยาม พารากอน": {"lat": 13.7462, "lon": 100.5347, "aliases": ["สยามพารากอน"]},
+    "เซ็นทรัล เวิลด์": {"lat": 13.7466, "lon": 100.5393, "aliases": []},
+    "เอ็มบีเค": {"lat": 13.7446, "lon": 100.5300, "aliases": ["มาบูญครอง สยาม"]},
+    "ไอคอน สยาม": {"lat": 13.7266, "lon": 100.5104, "aliases": []},
+    "เทอร์มินอล 21": {"lat": 13.7377, "lon": 100.5604, "aliases": []},
+    "แพลตินัม แฟชั่น มอลล์": {"lat": 13.7503, "lon": 100.5395, "aliases": []},
+
+    # โรงพยาบาล
+    "โรงพยาบาลจุฬาลงกรณ์": {"lat": 13.7326, "lon": 100.5360, "aliases": []},
+    "โรงพยาบาลศิริราช": {"lat": 13.7590, "lon": 100.4850, "aliases": []},
+    "โรงพยาบาลรามาธิบดี": {"lat": 13.7660, "lon": 100.5265, "aliases": []},
+    "โรงพยาบาลเวชศาสตร์": {"lat": None, "lon": None, "aliases": []},
+
+    # สถานที่ท่องเที่ยว
+    "จังหวัดภูเก็ต": {"lat": 7.8804, "lon": 98.3923, "aliases": ["ภูเก็ต"]},
+    "จังหวัดเชียงใหม่": {"lat": 18.7883, "lon": 98.9853, "aliases": ["เชียงใหม่"]},
+    "จังหวัดขอนแก่น": {"lat": 16.4322, "lon": 102.8236, "aliases": []},
+    "จังหวัดสงขลา": {"lat": 7.1898, "lon": 100.5954, "aliases": []},
+    "จังหวัดสุราษฎร์ธานี": {"lat": 9.1382, "lon": 99.3217, "aliases": []},
+    "พัทยา": {"lat": 12.9236, "lon": 100.8825, "aliases": []},
+}
+
+EARTH_RADIUS_M = 6371008.8
+
+# เพิ่มทุกครั้งที่ GAZETTEER เปลี่ยน เพื่อให้ index ต่างๆ รู้ว่าต้อง rebuild
+_version = 0
+_lock = threading.Lock()
+
+
+def normalize_text(text):
+    """normalize ชื่อสถานที่: ตัดช่องว่างหัวท้าย, ตัวพิมพ์เล็ก และรวมช่องว่างซ้ำ"""
+    t = (text or "").strip().lower()
+    t = " ".join(t.split())
+    return t
+
+
+def get_version():
+    return _version
+
+
+def add_place(name, lat=None, lon=None, aliases=None):
+    """เพิ่ม/อัปเดตสถานที่ใน gazetteer (alias ใหม่จะถูกรวมกับของเดิม)"""
+    global _version
+    with _lock:
+        entry = GAZETTEER.setdefault(name, {"lat": None, "lon": None, "aliases": []})
+        if lat is not None and lon is not None:
+            entry["lat"], entry["lon"] = float(lat), float(lon)
+        for alias in aliases or []:
+            if alias not in entry["aliases"]:
+                entry["aliases"].append(alias)
+        _version += 1
+
+
+def iter_names():
+    """คืน (ชื่อ, ชื่อทางการ) ของทุกชื่อและ alias ใน gazetteer"""
+    for name, entry in list(GAZETTEER.items()):
+        yield name, name
+        for alias in entry["aliases"]:
+            yield alias, name
+
+
+def canonical_name(name):
+    """แปลงชื่อหรือ alias เป็นชื่อทางการ (None ถ้าไม่รู้จัก)"""
+    query = normalize_text(name)
+    for candidate, canonical in iter_names():
+        if normalize_text(candidate) == query:
+            return canonical
+    return None
+
+
+def get_coordinates(name):
+    """คืน (lat, lon) ของชื่อหรือ alias ใน gazetteer หรือ None ถ้าไม่มีพิกัด"""
+    canonical = canonical_name(name)
+    if canonical is None:
+        return None
+    entry = GAZETTEER[canonical]
+    if entry["lat"] is None or entry["lon"] is None:
+        return None
+    return entry["lat"], entry["lon"]
+
+
+def haversine_m(lat1, lon1, lat2, lon2):
+    """ระยะทางบนผิวโลก (เมตร) ระหว่างสองพิกัด"""
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    dp = p2 - p1
+    dl = math.radians(lon2 - lon1)
+    a = math.sin(dp / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(min(1.0, math.sqrt(a)))
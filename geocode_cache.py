@@ -0,0 +1,294 @@
+# --- แคชพิกัดและตัวอุ่นแคชเบื้องหลัง (Geocode Cache Warmer) ---
+# ผู้ใช้ที่ค้นสถานที่ที่รู้จัก (ชื่อทางการ/alias ใน gazetteer) จะได้พิกัดจากแคชหรือ gazetteer ทันที ไม่รอ network
+# thread เบื้องหลังจะ geocode ทุกสถานที่ใน gazetteer ตอนเริ่มแอป (ที่ยังไม่มีพิกัดทำก่อน) ภายใต้ rate limit
+# ของแต่ละ provider แล้ววนตรวจซ้ำรายการที่เก่ากว่า GEOCODE_CACHE_TTL_S พร้อมบันทึกว่า provider ตรงกันหรือไม่
+# แคชถูกบันทึกเป็น JSON ที่ GEOCODE_CACHE_PATH (เขียนไฟล์ใหม่แล้ว os.replace) จึงไม่ต้องอุ่นใหม่ทุกครั้งที่ deploy
+import json
+import os
+import threading
+import time
+
+import gazetteer
+from offline_providers import OfflineLocation
+
+# แยกไฟล์แคชตามชุด provider (GEOCODER_PROVIDER เดียวกับ app.py) ผลจากผู้ให้บริการจำลองจึงไม่ปนกับผลจริง
+# และไม่ถูกนับว่า "ตรวจแล้ว" จนโหมดออนไลน์ข้ามการตรวจไปตลอด GEOCODE_CACHE_TTL_S
+GEOCODER_PROVIDER = os.environ.get("GEOCODER_PROVIDER", "online")
+GEOCODE_CACHE_PATH = os.environ.get("GEOCODE_CACHE_PATH", os.path.join(
+    "data", "geocode_cache.json" if GEOCODER_PROVIDER == "online" else f"geocode_cache.{GEOCODER_PROVIDER}.json"
+))
+GEOCODE_CACHE_TTL_S = float(os.environ.get("GEOCODE_CACHE_TTL_S", str(7 * 24 * 3600)))
+GEOCODE_CACHE_MAX_ENTRIES = int(os.environ.get("GEOCODE_CACHE_MAX_ENTRIES", "10000"))
+GEOCODE_WARMER_ENABLED = os.environ.get("GEOCODE_WARMER_ENABLED", "1") == "1"
+GEOCODE_REFRESH_INTERVAL_S = float(os.environ.get("GEOCODE_REFRESH_INTERVAL_S", "3600"))  # รอบตรวจรายการที่เก่า
+GEOCODE_RETRY_S = float(os.environ.get("GEOCODE_RETRY_S", "900"))  # ถ้าทุก provider ล้มเหลว รอเท่านี้ก่อนลองใหม่
+AGREEMENT_M = 250.0  # provider ให้พิกัดห่างกันไม่เกินนี้ถือว่าตรงกัน
+
+# ช่วงห่างขั้นต่ำระหว่าง request ของแต่ละ provider (Nominatim กำหนดไม่เกิน 1 ครั้ง/วินาที)
+PROVIDER_MIN_INTERVAL_S = {
+    "arcgis": float(os.environ.get("ARCGIS_MIN_INTERVAL_S", "0.5")),
+    "nominatim": float(os.environ.get("NOMINATIM_MIN_INTERVAL_S", "1.0")),
+}
+DEFAULT_MIN_INTERVAL_S = 0.5
+SAVE_EVERY = 10  # บันทึกไฟล์ทุกกี่รายการที่ตรวจระหว่างอุ่นแคช
+
+
+class RateLimiter:
+    """บังคับช่วงห่างขั้นต่ำระหว่างการเรียก (ใช้ร่วมกันได้หลาย thread)"""
+
+    def __init__(self, min_interval_s):
+        self.min_interval_s = min_interval_s
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            delay = self._next - now
+            self._next = max(now, self._next) + self.min_interval_s
+        if delay > 0:
+            time.sleep(delay)
+
+
+# limiter ต่อ provider ใช้ร่วมกันทั้ง process (ตัวอุ่นแคชและการค้นของผู้ใช้) เพื่อให้รวมกันไม่เกิน rate limit
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def rate_limiter(provider):
+    with _limiters_lock:
+        if provider not in _limiters:
+            _limiters[provider] = RateLimiter(PROVIDER_MIN_INTERVAL_S.get(provider, DEFAULT_MIN_INTERVAL_S))
+        return _limiters[provider]
+
+
+def cache_key(name):
+    """ชื่อทางการถ้ารู้จักใน gazetteer ไม่เช่นนั้นเป็นข้อความที่ normalize แล้ว"""
+    return gazetteer.canonical_name(name) or gazetteer.normalize_text(name)
+
+
+def _spread_m(coords):
+    spread = 0.0
+    for i in range(len(coords)):
+        for j in range(i + 1, len(coords)):
+            spread = max(spread, gazetteer.haversine_m(*coords[i], *coords[j]))
+    return spread
+
+
+class GeocodeCache:
+    """แคชพิกัดแบบ thread-safe: key -> entry (พิกัดที่เลือก, ผลของแต่ละ provider, ความตรงกัน, เวลาตรวจล่าสุด)"""
+
+    def __init__(self, path=GEOCODE_CACHE_PATH, max_entries=GEOCODE_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self._entries = {}
+        self._lock = threading.Lock()
+        self.hits = self.gazetteer_hits = self.misses = 0
+        self._load()
+
+    def _load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                self._entries = json.load(f)
+        except (OSError, ValueError):
+            self._entries = {}  # ไฟล์เสียก็เริ่มใหม่ ไม่ให้แอปล้ม
+
+    def save(self):
+        if not self.path:
+            return
+        with self._lock:
+            data = json.dumps(self._entries, ensure_ascii=False)
+        directory = os.path.dirname(self.path) or "."
+        os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(data)
+            os.replace(tmp_path, self.path)
+        except OSError:
+            pass  # บันทึกไม่ได้ก็ยังใช้แคชในหน่วยความจำต่อได้
+
+    def __len__(self):
+        return len(self._entries)
+
+    def keys(self):
+        with self._lock:
+            return list(self._entries)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            return dict(entry) if entry else None
+
+    def lookup(self, name):
+        """คืน OfflineLocation จากแคช หรือจากพิกัดใน gazetteer ถ้ายังไม่ถูกอุ่น (None = ต้องถาม network)"""
+        key = cache_key(name)
+        entry = self.get(key)
+        if entry and entry.get("lat") is not None:
+            self.hits += 1
+            return OfflineLocation(entry["lat"], entry["lon"], entry.get("address") or key)
+        coords = gazetteer.get_coordinates(key)
+        if coords:
+            self.gazetteer_hits += 1
+            return OfflineLocation(coords[0], coords[1], key)
+        self.misses += 1
+        return None
+
+    def is_stale(self, key, now=None):
+        now = now or time.time()
+        entry = self.get(key)
+        if entry is None:
+            return True
+        if entry.get("verified_at") and now - entry["verified_at"] < GEOCODE_CACHE_TTL_S:
+            return False
+        return not entry.get("attempted_at") or now - entry["attempted_at"] >= GEOCODE_RETRY_S
+
+    def record(self, key, results, order=None, now=None):
+        """บันทึกผลของหลาย provider: results = {provider: (lat, lon, address)} พิกัดที่ใช้มาจาก provider แรกตาม order"""
+        now = now or time.time()
+        with self._lock:
+            entry = self._entries.setdefault(key, {"lat": None, "lon": None, "address": None})
+            entry["attempted_at"] = now
+            if not results:
+                return  # ทุก provider ล้มเหลว เก็บพิกัดเดิมไว้และรอ GEOCODE_RETRY_S
+            names = [p for p in (order or results) if p in results]
+            primary = results[names[0]]
+            coords = [results[p][:2] for p in names]
+            entry.update(
+                lat=primary[0], lon=primary[1], address=primary[2], source=names[0], verified_at=now,
+                providers={p: [results[p][0], results[p][1]] for p in names},
+                spread_m=round(_spread_m(coords), 1),
+            )
+            entry["agree"] = entry["spread_m"] <= AGREEMENT_M if len(coords) > 1 else None
+            reference = gazetteer.get_coordinates(key)
+            entry["gazetteer_offset_m"] = (
+                round(gazetteer.haversine_m(reference[0], reference[1], primary[0], primary[1]), 1)
+                if reference else None
+            )
+            self._evict()
+
+    def remember(self, name, location, provider):
+        """เก็บผลจากการค้นของผู้ใช้ (write-through) เพื่อให้ครั้งต่อไปไม่ต้องถาม network"""
+        self.record(cache_key(name), {provider: (location.latitude, location.longitude, location.address)})
+
+    def _evict(self):
+        # เก็บรายการของ gazetteer ไว้เสมอ ตัดรายการที่ผู้ใช้ค้นซึ่งตรวจนานที่สุดออกก่อน
+        overflow = len(self._entries) - self.max_entries
+        if overflow <= 0:
+            return
+        removable = sorted(
+            (e.get("verified_at") or 0, k) for k, e in self._entries.items() if k not in gazetteer.GAZETTEER
+        )
+        for _, key in removable[:overflow]:
+            del self._entries[key]
+
+    def stats(self):
+        with self._lock:
+            entries = list(self._entries.values())
+        verified = [e for e in entries if e.get("verified_at")]
+        return {
+            "entries": len(entries),
+            "verified": len(verified),
+            "disagree": sum(1 for e in verified if e.get("agree") is False),
+            "hits": self.hits,
+            "gazetteer_hits": self.gazetteer_hits,
+            "misses": self.misses,
+        }
+
+
+def warm_order(cache):
+    """สถานที่ที่ gazetteer ไม่มีพิกัด (ผู้ใช้ต้องรอ network) ก่อน แล้วสถานที่อื่น แล้วรายการที่ผู้ใช้เคยค้น"""
+    names = list(gazetteer.GAZETTEER)
+    missing = [n for n in names if gazetteer.GAZETTEER[n]["lat"] is None]
+    known = [n for n in names if gazetteer.GAZETTEER[n]["lat"] is not None]
+    extra = [k for k in cache.keys() if k not in gazetteer.GAZETTEER]
+    return missing + known + extra
+
+
+class CacheWarmer(threading.Thread):
+    """thread เบื้องหลังที่ geocode รายการที่ยังไม่มี/เก่าในแคช กับทุก provider ภายใต้ rate limit"""
+
+    def __init__(self, cache, providers, refresh_interval_s=GEOCODE_REFRESH_INTERVAL_S, timeout_s=10):
+        super().__init__(name="geocode-cache-warmer", daemon=True)
+        self.cache = cache
+        self.providers = providers  # {ชื่อ provider: geocoder ที่มี geocode(query, timeout=...)}
+        self.refresh_interval_s = refresh_interval_s
+        self.timeout_s = timeout_s
+        self.passes = 0
+        self.last_pass_s = None
+        self._stop_event = threading.Event()
+
+    def verify(self, key):
+        results = {}
+        for name, geocoder in self.providers.items():
+            if self._stop_event.is_set():
+                return
+            rate_limiter(name).wait()
+            try:
+                location = geocoder.geocode(key, timeout=self.timeout_s)
+            except Exception:
+                continue  # provider นี้ล่ม/ติด rate limit ครั้งนี้ ใช้ผลของ provider อื่น
+            if location:
+                results[name] = (location.latitude, location.longitude, location.address)
+        self.cache.record(key, results, order=list(self.providers))
+
+    def run_pass(self):
+        started = time.perf_counter()
+        checked = 0
+        for key in warm_order(self.cache):
+            if self._stop_event.is_set():
+                break
+            if not self.cache.is_stale(key):
+                continue
+            self.verify(key)
+            checked += 1
+            if checked % SAVE_EVERY == 0:
+                self.cache.save()
+        if checked:
+            self.cache.save()
+        self.passes += 1
+        self.last_pass_s = time.perf_counter() - started
+        return checked
+
+    def run(self):
+        while not self._stop_event.is_set():
+            self.run_pass()
+            self._stop_event.wait(self.refresh_interval_s)
+
+    def stop(self):
+        self._stop_event.set()
+
+
+# --- แคชและ warmer ตัวเดียวต่อ process ---
+_default_cache = None
+_warmer = None
+_default_lock = threading.Lock()
+
+
+def get_default_cache():
+    global _default_cache
+    if _default_cache is None:
+        with _default_lock:
+            if _default_cache is None:
+                _default_cache = GeocodeCache()
+    return _default_cache
+
+
+def start_warmer(providers):
+    """เริ่ม CacheWarmer ครั้งเดียวต่อ process (เรียกซ้ำได้ทุก rerun) คืน warmer หรือ None ถ้าปิดไว้"""
+    global _warmer
+    if not GEOCODE_WARMER_ENABLED:
+        return None
+    if _warmer is None:
+        cache = get_default_cache()
+        with _default_lock:
+            if _warmer is None:
+                _warmer = CacheWarmer(cache, providers)
+                _warmer.start()
+    return _warmer
+
+
+def get_warmer():
+    return _warmer
@@ -0,0 +1,403 @@
+# --- Load test แบบหลาย session พร้อมกันสำหรับ app.py ---
+# เปิด `streamlit run app.py` จริงหนึ่ง server แล้วจำลองผู้ควบคุมโดรนหลายคนเป็น websocket client
+# (โปรโตคอลเดียวกับ browser: ส่ง BackMsg rerun_script พร้อมค่า widget แล้วรอ script_finished)
+# ทุก session จึงเป็น thread ใน process เดียวกันของ server ใช้ GIL, st.cache_resource, tokenizer trie,
+# rate limiter และคิวถอดเสียงร่วมกันเหมือนตอนใช้งานจริง
+# คำสั่งเสียงส่งเป็นค่าของ component บันทึกเสียง จึงผ่าน transcribe_audio ของแอป (preprocess -> คิว worker)
+# ใช้ผู้ให้บริการจำลอง (offline_providers.py) จึงไม่ต้องมีอินเทอร์เน็ต/โมเดล
+# วัด latency ต่อ session, throughput, CPU และหน่วยความจำของ server (รวม worker) เพื่อหาจุดอิ่มตัว
+#
+# ต้องติดตั้ง websockets (pip install websockets)
+# ตัวอย่าง:
+#   python load_test.py --levels 1,5,10,20 --queries 5 --audio-ratio 0.3 --out load_test_results.json
+import argparse
+import asyncio
+import io
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+import wave
+
+import numpy as np
+
+try:
+    import psutil
+    PSUTIL_AVAILABLE = True
+except ImportError:
+    PSUTIL_AVAILABLE = False
+
+try:
+    import websockets
+    WEBSOCKETS_AVAILABLE = True
+except ImportError:
+    WEBSOCKETS_AVAILABLE = False
+
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+from streamlit.proto.WidgetStates_pb2 import WidgetState
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_PATH = os.path.join(APP_DIR, "app.py")
+
+# env ของ server: ผู้ให้บริการจำลอง และปิดตัวอุ่นแคชเพื่อวัดเฉพาะโหลดจากผู้ใช้
+SERVER_ENV = {
+    "GEOCODER_PROVIDER": "offline",
+    "WHISPER_BACKEND": "offline",
+    "GEOCODE_WARMER_ENABLED": "0",
+}
+
+TYPED_QUERIES = [
+    "มอกะ",
+    "มหาวิทยาลัยชุลาลงกร",
+    "เกษตร",
+    "สุวรรณภูมิ",
+    "อนุสาวรีย์ชัยสมรภูมิ",
+    "วัดพระแก้ว",
+    "ฉันต้องการไปมหาวิทยาลัยกรุงเทพ",
+    "ไปไอคอน สยาม",
+    "โรงพยาบาลศิริราช",
+    "สถานี BTS สยาม",
+]
+SATURATION_GAIN = 0.10      # throughput เพิ่มน้อยกว่านี้เมื่อเพิ่ม session = อิ่มตัว
+SATURATION_P95_FACTOR = 3.0  # หรือ p95 latency แย่กว่าระดับแรกเกินเท่านี้
+FOUND_METRIC_PREFIX = "📍 ละติจูด"  # metric ที่แสดงเมื่อค้นพบพิกัด
+SEARCH_BUTTON_PREFIX = "🔎"
+
+
+def synthetic_command_wav(rng, speech_s=1.5, silence_s=1.0, rate=16000):
+    """WAV mono 16 kHz แบบที่ audio_recorder ส่งมา: ความเงียบ + เสียงคล้ายพูด + ความเงียบท้าย (pause_threshold=2.0)"""
+    n_speech, n_silence = int(speech_s * rate), int(silence_s * rate)
+    t = np.arange(n_speech) / rate
+    envelope = 0.5 * (1 - np.cos(2 * np.pi * 4 * t)) * 0.4
+    speech = envelope * np.sin(2 * np.pi * rng.uniform(120, 260) * t)
+    signal = np.concatenate([np.zeros(n_silence), speech, np.zeros(n_silence * 2)])
+    signal += rng.normal(0, 1e-4, len(signal))
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(rate)
+        wav.writeframes((signal * 32767).astype("<i2").tobytes())
+    return buf.getvalue()
+
+
+def recorder_value(wav_bytes):
+    """ค่าที่ frontend ของ audio_recorder ส่งกลับ: JSON string ของ list ของ byte (แอป decode ด้วย json.loads)"""
+    return json.dumps(json.dumps(list(wav_bytes)))
+
+
+class ResourceSampler(threading.Thread):
+    """สุ่มวัด CPU% และ RSS ของ server process รวม worker processes ทุก interval_s"""
+
+    def __init__(self, pid, interval_s=0.25):
+        super().__init__(daemon=True)
+        self.pid = pid
+        self.interval_s = interval_s
+        self.cpu_samples = []
+        self.rss_samples = []
+        self._stop_event = threading.Event()
+
+    def _processes(self):
+        root = psutil.Process(self.pid)
+        return [root] + root.children(recursive=True)
+
+    def run(self):
+        if not PSUTIL_AVAILABLE:
+            return  # ต้องมี psutil จึงวัด process อื่นได้
+        known = {}
+        while not self._stop_event.wait(self.interval_s):
+            cpu, rss = 0.0, 0
+            try:
+                processes = self._processes()
+            except psutil.Error:
+                continue
+            for proc in processes:
+                try:
+                    if proc.pid not in known:
+                        known[proc.pid] = proc
+                        proc.cpu_percent(None)  # ครั้งแรกคืน 0 เสมอ ใช้เป็นจุดเริ่มวัด
+                        continue
+                    cpu += known[proc.pid].cpu_percent(None)
+                    rss += proc.memory_info().rss
+                except psutil.Error:
+                    continue
+            self.cpu_samples.append(cpu)
+            self.rss_samples.append(rss / (1024 * 1024))
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+    def summary(self):
+        return {
+            "cpu_avg_pct": round(float(np.mean(self.cpu_samples)), 1) if self.cpu_samples else None,
+            "cpu_max_pct": round(float(np.max(self.cpu_samples)), 1) if self.cpu_samples else None,
+            "rss_max_mb": round(float(np.max(self.rss_samples)), 1) if self.rss_samples else None,
+        }
+
+
+# --- server ---
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(port, startup_timeout_s=60):
+    """เปิด `streamlit run app.py` เป็น subprocess แล้วรอจน health check ผ่าน"""
+    env = dict(os.environ)
+    for key, value in SERVER_ENV.items():
+        env.setdefault(key, value)
+    process = subprocess.Popen(
+        [
+            sys.executable, "-m", "streamlit", "run", APP_PATH,
+            "--server.headless", "true",
+            "--server.address", "127.0.0.1",
+            "--server.port", str(port),
+            "--browser.gatherUsageStats", "false",
+            # ให้ server ส่ง ForwardMsg เต็มเสมอ (client นี้ไม่มี message cache แบบ browser)
+            "--global.minCachedMessageSize", str(10 ** 12),
+        ],
+        cwd=APP_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+    )
+    deadline = time.time() + startup_timeout_s
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"streamlit server หยุดทำงาน: {process.stderr.read().decode(errors='replace')[-2000:]}")
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/_stcore/health", timeout=1) as response:
+                if response.status == 200:
+                    return process
+        except OSError:
+            time.sleep(0.5)
+    process.terminate()
+    raise RuntimeError("streamlit server ไม่พร้อมภายในเวลาที่กำหนด")
+
+
+def stop_server(process):
+    process.terminate()
+    try:
+        process.wait(timeout=15)
+    except subprocess.TimeoutExpired:
+        process.kill()
+
+
+# --- client ที่พูดโปรโตคอลเดียวกับ browser ---
+class AppSession:
+    """หนึ่งแท็บ browser: เชื่อม websocket แล้วสั่ง rerun พร้อมค่า widget"""
+
+    def __init__(self, url, timeout_s):
+        self.url = url
+        self.timeout_s = timeout_s
+        self.ws = None
+        self.widgets = {}  # (ชนิด, label) -> widget id
+
+    async def __aenter__(self):
+        self.ws = await websockets.connect(self.url, subprotocols=["streamlit"], max_size=None)
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.ws.close()
+
+    async def _collect_run(self):
+        """อ่าน ForwardMsg จนสคริปต์จบ (ข้ามรอบที่จบเพราะ st.rerun) คืน element ของรอบสุดท้าย"""
+        elements = []
+        while True:
+            msg = ForwardMsg()
+            msg.ParseFromString(await self.ws.recv())
+            kind = msg.WhichOneof("type")
+            if kind == "delta" and msg.delta.WhichOneof("type") == "new_element":
+                elements.append(msg.delta.new_element)
+            elif kind == "script_finished":
+                if msg.script_finished == ForwardMsg.FINISHED_EARLY_FOR_RERUN:
+                    elements = []
+                    continue
+                return elements
+
+    async def rerun(self, widget_states=()):
+        msg = BackMsg()
+        msg.rerun_script.query_string = ""
+        msg.rerun_script.widget_states.widgets.extend(widget_states)
+        await self.ws.send(msg.SerializeToString())
+        elements = await asyncio.wait_for(self._collect_run(), self.timeout_s)
+        for element in elements:
+            kind = element.WhichOneof("type")
+            widget = getattr(element, kind)
+            widget_id = getattr(widget, "id", "")
+            if widget_id:
+                self.widgets.setdefault((kind, getattr(widget, "label", "")), widget_id)
+        return elements
+
+    def widget_id(self, kind, label_prefix=""):
+        return next(wid for (k, label), wid in self.widgets.items() if k == kind and label.startswith(label_prefix))
+
+
+def _outcome(elements):
+    errors = [e.exception.message for e in elements if e.WhichOneof("type") == "exception"]
+    found = any(e.WhichOneof("type") == "metric" and e.metric.label.startswith(FOUND_METRIC_PREFIX) for e in elements)
+    return errors, found
+
+
+async def run_session(url, queries, audio_ratio, timeout_s, seed, start_event):
+    """หนึ่ง session: โหลดหน้าแอป แล้วส่งคำสั่งทีละคำสั่งตามลำดับ (เหมือนผู้ใช้หนึ่งคน)"""
+    rng = np.random.default_rng(seed)
+    picker = random.Random(seed)
+    records = []
+    await start_event.wait()
+    started = time.perf_counter()
+    try:
+        async with AppSession(url, timeout_s) as session:
+            elements = await session.rerun()
+            errors, _ = _outcome(elements)
+            records.append({"kind": "page_load", "latency_s": time.perf_counter() - started, "ok": not errors})
+            text_input = session.widget_id("text_input")
+            search_button = session.widget_id("button", SEARCH_BUTTON_PREFIX)
+            recorder = session.widget_id("component_instance") if audio_ratio > 0 else None
+
+            for _ in range(queries):
+                kind = "audio" if recorder and picker.random() < audio_ratio else "typed"
+                if kind == "audio":
+                    states = [WidgetState(id=recorder, json_value=recorder_value(synthetic_command_wav(rng)))]
+                else:
+                    states = [
+                        WidgetState(id=text_input, string_value=picker.choice(TYPED_QUERIES)),
+                        WidgetState(id=search_button, trigger_value=True),
+                    ]
+                t0 = time.perf_counter()
+                try:
+                    errors, found = _outcome(await session.rerun(states))
+                    record = {"kind": kind, "latency_s": time.perf_counter() - t0, "ok": not errors, "found": found}
+                    if errors:
+                        record["error"] = errors[0]
+                except Exception as e:
+                    record = {"kind": kind, "latency_s": time.perf_counter() - t0, "ok": False, "error": repr(e)}
+                records.append(record)
+                if not record["ok"] and isinstance(record.get("error"), str) and "Timeout" in record["error"]:
+                    break  # websocket ค้างรอผลเก่าอยู่ ใช้ต่อไม่ได้
+    except Exception as e:
+        records.append({"kind": "page_load", "latency_s": time.perf_counter() - started, "ok": False, "error": repr(e)})
+    return records
+
+
+def _percentile(values, q):
+    return round(float(np.percentile(values, q)), 3) if values else None
+
+
+async def _run_sessions(url, sessions, queries, audio_ratio, timeout_s, seed, on_start):
+    start_event = asyncio.Event()
+    tasks = [
+        asyncio.create_task(run_session(url, queries, audio_ratio, timeout_s, seed * 1000 + i, start_event))
+        for i in range(sessions)
+    ]
+    on_start()
+    start_event.set()
+    return await asyncio.gather(*tasks)
+
+
+def run_level(url, server_pid, sessions, queries, audio_ratio, timeout_s, seed):
+    sampler = ResourceSampler(server_pid)
+    sampler.start()
+    started = [None]
+
+    def on_start():
+        started[0] = time.perf_counter()
+
+    results = asyncio.run(_run_sessions(url, sessions, queries, audio_ratio, timeout_s, seed, on_start))
+    wall_s = time.perf_counter() - started[0]
+    sampler.stop()
+
+    all_records = [r for records in results for r in records]
+    query_records = [r for r in all_records if r["kind"] != "page_load"]
+    summary = {
+        "sessions": sessions,
+        "wall_s": round(wall_s, 2),
+        "queries": len(query_records),
+        "errors": sum(not r["ok"] for r in all_records),
+        "not_found": sum(r["ok"] and not r.get("found", True) for r in query_records),
+        "throughput_qps": round(len(query_records) / wall_s, 2) if wall_s else 0.0,
+        "per_session_mean_s": {
+            str(i): round(float(np.mean([r["latency_s"] for r in records if r["kind"] != "page_load"] or [0])), 3)
+            for i, records in enumerate(results)
+        },
+    }
+    for kind in ("page_load", "typed", "audio"):
+        latencies = [r["latency_s"] for r in all_records if r["kind"] == kind]
+        summary[kind] = {
+            "count": len(latencies),
+            "p50_s": _percentile(latencies, 50),
+            "p95_s": _percentile(latencies, 95),
+            "max_s": round(max(latencies), 3) if latencies else None,
+        }
+    latencies = [r["latency_s"] for r in query_records]
+    summary["p95_s"] = _percentile(latencies, 95)
+    summary.update(sampler.summary())
+    sample_errors = [r["error"] for r in all_records if r.get("error")][:3]
+    if sample_errors:
+        summary["sample_errors"] = sample_errors
+    return summary
+
+
+def find_saturation(levels):
+    """ระดับ session แรกที่ throughput แทบไม่เพิ่ม หรือ p95 latency พุ่งเกินเกณฑ์ (None ถ้ายังไม่อิ่มตัว)"""
+    if not levels:
+        return None
+    base_p95 = levels[0]["p95_s"] or 0
+    for previous, current in zip(levels, levels[1:]):
+        gain = (current["throughput_qps"] - previous["throughput_qps"]) / max(previous["throughput_qps"], 1e-9)
+        if gain < SATURATION_GAIN or (base_p95 and (current["p95_s"] or 0) > base_p95 * SATURATION_P95_FACTOR):
+            return previous["sessions"]
+    return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load test หลาย session สำหรับ app.py (streamlit server จริง + ผู้ให้บริการจำลอง)")
+    parser.add_argument("--levels", default="1,5,10,20", help="จำนวน session พร้อมกันในแต่ละรอบ คั่นด้วย ,")
+    parser.add_argument("--queries", type=int, default=5, help="จำนวนคำสั่งต่อ session")
+    parser.add_argument("--audio-ratio", type=float, default=0.3, help="สัดส่วนคำสั่งเสียง (0-1)")
+    parser.add_argument("--timeout", type=float, default=120.0, help="timeout ต่อการรันสคริปต์หนึ่งครั้ง (วินาที)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--port", type=int, default=0, help="port ของ server (0 = สุ่ม)")
+    parser.add_argument("--out", default="", help="บันทึกผลเป็น JSON")
+    args = parser.parse_args(argv)
+
+    if not WEBSOCKETS_AVAILABLE:
+        parser.error("ต้องติดตั้ง websockets ก่อน: pip install websockets")
+    if not PSUTIL_AVAILABLE:
+        print("⚠️ ไม่มี psutil จะไม่รายงาน CPU/หน่วยความจำของ server", file=sys.stderr)
+
+    levels = [int(x) for x in args.levels.split(",") if x.strip()]
+    port = args.port or _free_port()
+    server = start_server(port)
+    url = f"ws://127.0.0.1:{port}/_stcore/stream"
+    results = []
+    try:
+        for sessions in levels:
+            summary = run_level(url, server.pid, sessions, args.queries, args.audio_ratio, args.timeout, args.seed)
+            results.append(summary)
+            print(
+                f"sessions={sessions:>3}  qps={summary['throughput_qps']:>6.2f}  "
+                f"typed p95={summary['typed']['p95_s']}s  audio p95={summary['audio']['p95_s']}s  "
+                f"errors={summary['errors']}  cpu avg/max={summary['cpu_avg_pct']}/{summary['cpu_max_pct']}%  "
+                f"rss max={summary['rss_max_mb']} MB",
+                flush=True,
+            )
+            if summary.get("sample_errors"):
+                print(f"    ตัวอย่าง error: {summary['sample_errors'][0][:200]}", flush=True)
+    finally:
+        stop_server(server)
+
+    saturation = find_saturation(results)
+    print(f"จุดอิ่มตัวโดยประมาณ: {saturation} sessions" if saturation else "ยังไม่ถึงจุดอิ่มตัวในช่วงที่ทดสอบ")
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump({"levels": results, "saturation_sessions": saturation}, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
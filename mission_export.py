@@ -0,0 +1,210 @@
+# --- ส่งออกผลลัพธ์เป็นไฟล์ภารกิจโดรน (Mission Export) ---
+# รูปแบบ: GeoJSON, KML, CSV, QGroundControl .plan และ QGC WPL 110 (.waypoints ของ MAVLink)
+# writer ทุกตัวเป็น generator ที่ yield ทีละชิ้นจาก iterable ของจุด จึงใช้หน่วยความจำคงที่
+# ไม่ว่าจะมีกี่หมื่นจุด (ไม่สร้าง list/dict ของทั้งไฟล์) และเขียนลงไฟล์หรือ stream ใดก็ได้
+#
+# จุดแต่ละจุดเป็น dict ที่มี "name", "latitude", "longitude" (และ "address", "altitude" ถ้ามี)
+# เหมือนผลของโหมดหลายจุดหมาย จุดที่ไม่มีพิกัด (เช่น ค้นไม่เจอ) จะถูกข้าม
+#
+# ใช้แบบ batch จาก command line (ค้นจาก gazetteer / POI index ในเครื่อง ไม่ใช้ network):
+#   python mission_export.py names.txt --format plan --output mission.plan
+import argparse
+import csv
+import io
+import json
+import os
+import sys
+from xml.sax.saxutils import escape
+
+import gazetteer
+import poi_index
+
+EXPORT_ALTITUDE_M = float(os.environ.get("EXPORT_ALTITUDE_M", "50"))  # ความสูงบินเหนือจุดขึ้น (relative)
+
+# MAVLink
+MAV_CMD_NAV_WAYPOINT = 16
+MAV_FRAME_GLOBAL = 0
+MAV_FRAME_GLOBAL_RELATIVE_ALT = 3
+QGC_FIRMWARE_PX4 = 12
+QGC_VEHICLE_MULTIROTOR = 2
+
+
+def _valid_points(points):
+    for point in points:
+        if point.get("latitude") is None or point.get("longitude") is None:
+            continue
+        yield point
+
+
+def _altitude(point):
+    altitude = point.get("altitude")
+    return EXPORT_ALTITUDE_M if altitude is None else float(altitude)
+
+
+def iter_geojson(points):
+    yield '{"type": "FeatureCollection", "features": ['
+    for i, point in enumerate(_valid_points(points)):
+        feature = {
+            "type": "Feature",
+            "geometry": {"type": "Point", "coordinates": [point["longitude"], point["latitude"]]},
+            "properties": {"seq": i + 1, "name": point.get("name"), "address": point.get("address")},
+        }
+        yield ("\n" if i == 0 else ",\n") + json.dumps(feature, ensure_ascii=False)
+    yield "\n]}\n"
+
+
+def iter_kml(points):
+    yield ('<?xml version="1.0" encoding="UTF-8"?>\n'
+           '<kml xmlns="http://www.opengis.net/kml/2.2">\n<Document>\n')
+    for i, point in enumerate(_valid_points(points)):
+        description = point.get("address") or ""
+        yield (f"<Placemark><name>{escape(f'{i + 1}. ' + (point.get('name') or ''))}</name>"
+               f"<description>{escape(description)}</description>"
+               f"<Point><altitudeMode>relativeToGround</altitudeMode>"
+               f"<coordinates>{point['longitude']},{point['latitude']},{_altitude(point)}</coordinates>"
+               f"</Point></Placemark>\n")
+    yield "</Document>\n</kml>\n"
+
+
+def iter_csv(points):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def flush():
+        chunk = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return chunk
+
+    writer.writerow(["seq", "name", "latitude", "longitude", "altitude", "address"])
+    yield flush()
+    for i, point in enumerate(_valid_points(points)):
+        writer.writerow([i + 1, point.get("name"), point["latitude"], point["longitude"],
+                         _altitude(point), point.get("address") or ""])
+        yield flush()
+
+
+def iter_qgc_plan(points):
+    """QGroundControl .plan (JSON) จุดแรกเป็น home และทุกจุดเป็น waypoint แบบ relative altitude"""
+    yield '{"fileType": "Plan", "version": 1, "groundStation": "QGroundControl", "mission": {"items": ['
+    home = None
+    for i, point in enumerate(_valid_points(points)):
+        if home is None:
+            home = [point["latitude"], point["longitude"], 0]
+        altitude = _altitude(point)
+        item = {
+            "type": "SimpleItem", "autoContinue": True, "command": MAV_CMD_NAV_WAYPOINT,
+            "doJumpId": i + 1, "frame": MAV_FRAME_GLOBAL_RELATIVE_ALT,
+            "params": [0, 0, 0, None, point["latitude"], point["longitude"], altitude],
+            "Altitude": altitude, "AltitudeMode": 1, "AMSLAltAboveTerrain": None,
+        }
+        yield ("\n" if i == 0 else ",\n") + json.dumps(item)
+    # plannedHomePosition อยู่หลัง items เพื่อไม่ต้องอ่านจุดล่วงหน้า (ลำดับ key ใน JSON ไม่มีผล)
+    yield ("\n], " + json.dumps({
+        "plannedHomePosition": home or [0, 0, 0], "cruiseSpeed": 15, "hoverSpeed": 5,
+        "firmwareType": QGC_FIRMWARE_PX4, "vehicleType": QGC_VEHICLE_MULTIROTOR, "version": 2,
+    })[1:-1] + "}, ")
+    yield ('"geoFence": {"circles": [], "polygons": [], "version": 2}, '
+           '"rallyPoints": {"points": [], "version": 2}}\n')
+
+
+def iter_qgc_waypoints(points):
+    """QGC WPL 110 (.waypoints) แถว 0 เป็น home ตามรูปแบบของ MAVLink mission file"""
+    yield "QGC WPL 110\n"
+    seq = 0
+    for point in _valid_points(points):
+        if seq == 0:
+            yield (f"0\t1\t{MAV_FRAME_GLOBAL}\t{MAV_CMD_NAV_WAYPOINT}\t0\t0\t0\t0\t"
+                   f"{point['latitude']:.7f}\t{point['longitude']:.7f}\t0\t1\n")
+        seq += 1
+        yield (f"{seq}\t0\t{MAV_FRAME_GLOBAL_RELATIVE_ALT}\t{MAV_CMD_NAV_WAYPOINT}\t0\t0\t0\t0\t"
+               f"{point['latitude']:.7f}\t{point['longitude']:.7f}\t{_altitude(point):.2f}\t1\n")
+
+
+# รูปแบบ -> (writer, นามสกุลไฟล์, MIME type)
+EXPORT_FORMATS = {
+    "geojson": (iter_geojson, "geojson", "application/geo+json"),
+    "kml": (iter_kml, "kml", "application/vnd.google-earth.kml+xml"),
+    "csv": (iter_csv, "csv", "text/csv"),
+    "plan": (iter_qgc_plan, "plan", "application/json"),
+    "waypoints": (iter_qgc_waypoints, "waypoints", "text/plain"),
+}
+
+
+def write_export(fmt, points, fp):
+    """เขียนจุดทั้งหมดลง text file object ทีละชิ้น คืนจำนวน byte (UTF-8) ที่เขียน"""
+    writer = EXPORT_FORMATS[fmt][0]
+    written = 0
+    for chunk in writer(points):
+        fp.write(chunk)
+        written += len(chunk.encode("utf-8"))
+    return written
+
+
+def export_to_bytes(fmt, points):
+    """สร้างไฟล์ทั้งไฟล์เป็น bytes สำหรับ st.download_button (Streamlit อ่านข้อมูลทั้งหมดเข้าหน่วยความจำอยู่แล้ว
+    จึงเหมาะกับผลในหน้าเว็บที่มีไม่กี่จุด ไฟล์ใหญ่ให้ใช้ write_export / command line ที่เขียนลงไฟล์ทีละชิ้น)"""
+    return "".join(EXPORT_FORMATS[fmt][0](points)).encode("utf-8")
+
+
+# --- batch จาก command line ---
+def resolve_offline(name):
+    """ค้นพิกัดจาก gazetteer แล้ว POI index (ไม่มี network) คืน (dict ของจุด หรือ None, เหตุผลถ้าไม่พบ)"""
+    coords = gazetteer.get_coordinates(name)
+    if coords:
+        return {"name": gazetteer.canonical_name(name), "latitude": coords[0], "longitude": coords[1]}, None
+    try:
+        index = poi_index.get_default_index()
+    except (OSError, ValueError):
+        index = None
+    if index is not None:
+        match = index.lookup_unique(name)
+        if match:
+            found, lat, lon = match
+            return {"name": found, "latitude": lat, "longitude": lon}, None
+        matches = index.lookup(name)
+        if matches:
+            return None, f"กำกวม ({len(matches)} แห่งใน POI index)"
+    return None, "ไม่พบพิกัด"
+
+
+def _iter_names(fp):
+    for line in fp:
+        name = line.strip()
+        if name and not name.startswith("#"):
+            yield name
+
+
+def _iter_resolved(names, stats):
+    for name in names:
+        point, reason = resolve_offline(name)
+        if point is None:
+            stats["missing"] += 1
+            print(f"{reason}: {name}", file=sys.stderr)
+            continue
+        stats["exported"] += 1
+        yield point
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="ส่งออกรายชื่อสถานที่เป็นไฟล์ภารกิจโดรน")
+    parser.add_argument("input", help="ไฟล์รายชื่อสถานที่ บรรทัดละหนึ่งชื่อ (ใช้ - สำหรับ stdin)")
+    parser.add_argument("--format", choices=sorted(EXPORT_FORMATS), default="geojson")
+    parser.add_argument("--output", "-o", default="-", help="ไฟล์ปลายทาง (ค่าเริ่มต้น stdout)")
+    args = parser.parse_args(argv)
+
+    stats = {"exported": 0, "missing": 0}
+    source = sys.stdin if args.input == "-" else open(args.input, encoding="utf-8")
+    target = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8", newline="")
+    try:
+        write_export(args.format, _iter_resolved(_iter_names(source), stats), target)
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if target is not sys.stdout:
+            target.close()
+    print(f"ส่งออก {stats['exported']} จุด (ไม่พบ {stats['missing']})", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
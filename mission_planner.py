@@ -0,0 +1,79 @@
+# --- วางแผนภารกิจหลายจุดหมาย (Multi-waypoint Route Ordering) ---
+# สร้าง distance matrix ด้วย NumPy แล้วเรียงลำดับจุดด้วย nearest neighbour + 2-opt
+# เส้นทางเป็นแบบเปิด (ไม่ต้องบินกลับจุดเริ่ม) และจุดแรกคงที่เสมอ
+import numpy as np
+
+from gazetteer import EARTH_RADIUS_M
+
+
+def distance_matrix(coords):
+    """คืน matrix ระยะทาง (เมตร) แบบ haversine ขนาด n x n จาก list ของ (lat, lon)"""
+    pts = np.radians(np.asarray(coords, dtype=np.float64).reshape(-1, 2))
+    lat = pts[:, 0][:, None]
+    lon = pts[:, 1][:, None]
+    dlat = lat - lat.T
+    dlon = lon - lon.T
+    a = np.sin(dlat / 2.0) ** 2 + np.cos(lat) * np.cos(lat.T) * np.sin(dlon / 2.0) ** 2
+    return 2.0 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def route_length(dist, route):
+    route = np.asarray(route)
+    if len(route) < 2:
+        return 0.0
+    return float(dist[route[:-1], route[1:]].sum())
+
+
+def nearest_neighbour_route(dist, start=0):
+    """เริ่มจาก start แล้วไปจุดที่ใกล้ที่สุดที่ยังไม่ได้ไปเรื่อยๆ"""
+    n = dist.shape[0]
+    if n == 0:
+        return []
+    visited = np.zeros(n, dtype=bool)
+    route = [start]
+    visited[start] = True
+    current = start
+    for _ in range(n - 1):
+        row = np.where(visited, np.inf, dist[current])
+        current = int(np.argmin(row))
+        route.append(current)
+        visited[current] = True
+    return route
+
+
+def two_opt(dist, route, max_passes=50):
+    """ปรับเส้นทางด้วย 2-opt (กลับด้านช่วง route[i..j]) โดยคำนวณทุก j พร้อมกันแบบ vectorized"""
+    route = np.asarray(route, dtype=np.intp)
+    n = len(route)
+    if n < 4:
+        return route.tolist()
+
+    for _ in range(max_passes):
+        improved = False
+        for i in range(1, n - 1):
+            a, b = route[i - 1], route[i]
+            c = route[i + 1:]                      # ปลายช่วงที่จะกลับด้าน (j = i+1 .. n-1)
+            d = np.append(route[i + 2:], -1)       # จุดถัดจาก c (-1 = ปลายเส้นทาง)
+            has_next = d >= 0
+            d_safe = np.where(has_next, d, 0)
+            old = dist[a, b] + np.where(has_next, dist[c, d_safe], 0.0)
+            new = dist[a, c] + np.where(has_next, dist[b, d_safe], 0.0)
+            delta = new - old
+            k = int(np.argmin(delta))
+            if delta[k] < -1e-9:
+                j = i + 1 + k
+                route[i:j + 1] = route[i:j + 1][::-1].copy()
+                improved = True
+        if not improved:
+            break
+    return route.tolist()
+
+
+def plan_route(coords, start=0):
+    """คืน (ลำดับ index ที่ควรไป, ระยะทางรวมเมตร, distance matrix)"""
+    if len(coords) == 0:
+        return [], 0.0, np.zeros((0, 0))
+    dist = distance_matrix(coords)
+    route = nearest_neighbour_route(dist, start=start)
+    route = two_opt(dist, route)
+    return route, route_length(dist, route), dist
@@ -0,0 +1,230 @@
+# --- ตัวจัดการโมเดล Whisper แบบจำกัดหน่วยความจำ (Memory-budgeted Model Manager) ---
+# - โมเดลเล็ก (int8) โหลดค้างไว้เสมอ เพื่อตอบสนองเร็ว (tier "fast")
+# - โมเดลใหญ่โหลดเมื่อมีคำขอ (tier "accurate") และถูก unload เมื่อไม่ได้ใช้เกิน idle timeout
+#   ระหว่างที่โมเดลใหญ่ยังไม่อยู่ในหน่วยความจำ คำขอจะได้คำตอบจากโมเดลเล็กทันที แล้วโหลดโมเดลใหญ่เบื้องหลัง
+# - ก่อนโหลดจะประเมินขนาดโมเดล แล้ว unload โมเดลที่ใช้ล่าสุดนานที่สุดจนพอกับงบหน่วยความจำ
+import gc
+import os
+import threading
+import time
+
+try:
+    import psutil
+    PSUTIL_AVAILABLE = True
+except ImportError:
+    PSUTIL_AVAILABLE = False
+
+# จำนวนพารามิเตอร์ (ล้าน) ของโมเดล Whisper ใช้ประเมินหน่วยความจำก่อนโหลด
+MODEL_PARAMS_M = {
+    "tiny": 39, "base": 74, "small": 244, "medium": 769,
+    "large-v1": 1550, "large-v2": 1550, "large-v3": 1550,
+}
+BYTES_PER_WEIGHT = {"int8": 1, "int8_float32": 1, "int16": 2, "float16": 2, "float32": 4}
+LOAD_OVERHEAD_MB = 150  # tokenizer, buffers ของ CTranslate2 ฯลฯ
+
+FAST_MODEL = (os.environ.get("WHISPER_FAST_MODEL", "base"), "int8")
+
+# ลำดับ priority: large-v3 -> large-v2 -> medium (tier "accurate")
+ACCURATE_MODELS = [
+    ("large-v3", "float16"),  # แม่นยำที่สุด
+    ("large-v2", "float16"),  # รองลงมา
+    ("medium", "int8"),       # เร็วและแม่นยำพอสมควร
+]
+
+DEFAULT_TIER = os.environ.get("WHISPER_DEFAULT_TIER", "accurate")
+DEFAULT_MEMORY_BUDGET_MB = int(os.environ.get("WHISPER_MEMORY_BUDGET_MB", "4096"))
+DEFAULT_IDLE_UNLOAD_S = float(os.environ.get("WHISPER_IDLE_UNLOAD_S", "600"))
+WHISPER_BACKEND = os.environ.get("WHISPER_BACKEND", "faster-whisper")  # "offline" = โมเดลจำลอง
+
+
+def estimate_model_mb(model_name, compute_type):
+    params_m = MODEL_PARAMS_M.get(model_name, MODEL_PARAMS_M["large-v3"])
+    return params_m * BYTES_PER_WEIGHT.get(compute_type, 4) + LOAD_OVERHEAD_MB
+
+
+def rss_mb():
+    """หน่วยความจำที่ process นี้ใช้อยู่จริง (MB) หรือ None ถ้าวัดไม่ได้"""
+    if PSUTIL_AVAILABLE:
+        return psutil.Process().memory_info().rss / (1024 * 1024)
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class ModelManager:
+    """เก็บโมเดลที่โหลดไว้ใน process นี้ พร้อมนโยบาย budget / idle unload"""
+
+    def __init__(self, cpu_threads=4, memory_budget_mb=DEFAULT_MEMORY_BUDGET_MB,
+                 idle_unload_s=DEFAULT_IDLE_UNLOAD_S, fast_model=FAST_MODEL,
+                 accurate_models=ACCURATE_MODELS, loader=None):
+        self.cpu_threads = cpu_threads
+        self.memory_budget_mb = memory_budget_mb
+        self.idle_unload_s = idle_unload_s
+        self.fast_model = fast_model
+        self.accurate_models = list(accurate_models)
+        if loader is None and WHISPER_BACKEND == "offline":
+            from offline_providers import offline_whisper_loader
+            loader = offline_whisper_loader
+        self._loader = loader or self._load_whisper
+        # key -> {"model", "resident_mb", "last_used", "pinned", "loaded_at"}
+        self._models = {}
+        self._failed = {}
+        # thread โหลดโมเดลใหญ่เบื้องหลังแก้ _models พร้อมกับ worker loop จึงต้องมี lock
+        self._lock = threading.RLock()
+        self._loading = None
+        self._prefetch_thread = None
+
+    def _load_whisper(self, model_name, compute_type):
+        from faster_whisper import WhisperModel
+        return WhisperModel(model_name, device="cpu", compute_type=compute_type, cpu_threads=self.cpu_threads)
+
+    def used_mb(self):
+        with self._lock:
+            return sum(entry["resident_mb"] for entry in self._models.values())
+
+    def _evict_for(self, needed_mb):
+        """unload โมเดลที่ไม่ pinned ตามลำดับ LRU จนกว่าจะมีที่ว่างพอ (คืน False ถ้าไม่พอ)"""
+        candidates = sorted(
+            (key for key, entry in self._models.items() if not entry["pinned"]),
+            key=lambda key: self._models[key]["last_used"],
+        )
+        pinned_mb = sum(entry["resident_mb"] for entry in self._models.values() if entry["pinned"])
+        if pinned_mb + needed_mb > self.memory_budget_mb:
+            return False  # ต่อให้ unload ทุกตัวก็ไม่พอ อย่า unload ทิ้งเปล่าๆ
+        while self.used_mb() + needed_mb > self.memory_budget_mb and candidates:
+            self.unload(candidates.pop(0))
+        return self.used_mb() + needed_mb <= self.memory_budget_mb
+
+    def _ensure_loaded(self, model_name, compute_type, pinned=False):
+        key = f"{model_name}/{compute_type}"
+        with self._lock:
+            entry = self._models.get(key)
+            if entry:
+                entry["last_used"] = time.time()
+                return key, entry["model"]
+            if key in self._failed:
+                raise RuntimeError(self._failed[key])
+
+            estimate = estimate_model_mb(model_name, compute_type)
+            if not self._evict_for(estimate):
+                # โมเดลที่ pinned ไม่เคยถูก unload จึงไม่มีทางพอในภายหลัง จำไว้ไม่ให้ลองโหลด/prefetch ซ้ำทุกคำขอ
+                self._failed[key] = f"{key} (~{estimate:.0f} MB) เกินงบหน่วยความจำ {self.memory_budget_mb} MB"
+                raise MemoryError(self._failed[key])
+            self._loading = key
+        # โหลดนอก lock เพื่อให้ worker ยังถอดเสียงด้วยโมเดลที่อยู่ในหน่วยความจำต่อได้
+        before = rss_mb()
+        try:
+            model = self._loader(model_name, compute_type)
+        except Exception as e:
+            with self._lock:
+                self._failed[key] = f"{key}: {e}"
+                self._loading = None
+            raise
+        after = rss_mb()
+        measured = after - before if before is not None and after is not None else 0
+        now = time.time()
+        with self._lock:
+            self._models[key] = {
+                "model": model,
+                # ใช้ค่าที่วัดได้จริงถ้าดูสมเหตุสมผล (บางระบบ mmap ไฟล์โมเดลทำให้ RSS ยังไม่ขึ้นทันที)
+                "resident_mb": measured if measured > estimate * 0.25 else estimate,
+                "last_used": now,
+                "loaded_at": now,
+                "pinned": pinned,
+            }
+            self._loading = None
+        return key, model
+
+    def load_resident(self):
+        """โหลดโมเดลเล็กที่ต้องค้างไว้ตลอด (เรียกตอน worker เริ่มทำงาน)"""
+        return self._ensure_loaded(*self.fast_model, pinned=True)
+
+    def _resident_accurate(self):
+        with self._lock:
+            for model_name, compute_type in self.accurate_models:
+                key = f"{model_name}/{compute_type}"
+                entry = self._models.get(key)
+                if entry:
+                    entry["last_used"] = time.time()
+                    return key, entry["model"]
+        return None
+
+    def load_accurate(self):
+        """โหลดโมเดลใหญ่ตัวแรกที่โหลดได้ตามลำดับ priority (blocking) คืน (ชื่อ, model) หรือ None"""
+        for model_name, compute_type in self.accurate_models:
+            try:
+                return self._ensure_loaded(model_name, compute_type)
+            except Exception:
+                continue
+        return None
+
+    def prefetch_accurate(self):
+        """เริ่มโหลดโมเดลใหญ่ใน thread เบื้องหลัง (ไม่ทำซ้ำถ้ากำลังโหลดอยู่หรือโหลดไม่ได้ทุกตัว)"""
+        with self._lock:
+            if self._prefetch_thread is not None and self._prefetch_thread.is_alive():
+                return
+            if all(f"{name}/{compute}" in self._failed for name, compute in self.accurate_models):
+                return
+            self._prefetch_thread = threading.Thread(
+                target=self.load_accurate, name="whisper-prefetch", daemon=True
+            )
+            self._prefetch_thread.start()
+
+    def get(self, tier=DEFAULT_TIER, wait=False):
+        """คืน (ชื่อโมเดล, model) ตาม tier
+        ถ้าโมเดลใหญ่ยังไม่ได้โหลด จะคืนโมเดลเล็กทันทีแล้วโหลดโมเดลใหญ่เบื้องหลัง (wait=True = รอโหลดให้เสร็จ)"""
+        if tier == "accurate":
+            resident = self._resident_accurate()
+            if resident:
+                return resident
+            if wait:
+                loaded = self.load_accurate()
+                if loaded:
+                    return loaded
+            else:
+                self.prefetch_accurate()
+        return self.load_resident()
+
+    def unload(self, key):
+        with self._lock:
+            entry = self._models.pop(key, None)
+        if entry is None:
+            return
+        del entry["model"]
+        gc.collect()
+
+    def unload_idle(self, now=None):
+        """unload โมเดลที่ไม่ pinned และไม่ได้ใช้นานเกิน idle_unload_s คืนรายชื่อที่ถูก unload"""
+        now = time.time() if now is None else now
+        with self._lock:
+            idle = [
+                key for key, entry in self._models.items()
+                if not entry["pinned"] and now - entry["last_used"] > self.idle_unload_s
+            ]
+        for key in idle:
+            self.unload(key)
+        return idle
+
+    def report(self):
+        """หน่วยความจำต่อโมเดล สำหรับแสดงผล"""
+        now = time.time()
+        with self._lock:
+            models = list(self._models.items())
+            loading = self._loading
+        return {
+            "budget_mb": self.memory_budget_mb,
+            "loading": loading,
+            "used_mb": round(self.used_mb(), 1),
+            "process_rss_mb": round(rss_mb() or 0, 1),
+            "models": {
+                key: {
+                    "resident_mb": round(entry["resident_mb"], 1),
+                    "idle_s": round(now - entry["last_used"], 1),
+                    "pinned": entry["pinned"],
+                }
+                for key, entry in models
+            },
+        }
@@ -0,0 +1,53 @@
+# --- ผู้ให้บริการจำลองแบบ offline (ใช้กับ load test / พัฒนาโดยไม่มีอินเทอร์เน็ต) ---
+# GEOCODER_PROVIDER=offline   : ค้นพิกัดจาก gazetteer ในเครื่อง แทน ArcGIS/Nominatim
+# WHISPER_BACKEND=offline     : worker ใช้โมเดลจำลองแทน faster-whisper (ไม่ต้องดาวน์โหลดโมเดล)
+# หน่วงเวลาได้เพื่อเลียนแบบ network/decode จริง ผ่าน OFFLINE_GEOCODER_LATENCY_S และ OFFLINE_WHISPER_RTF
+import os
+import time
+from collections import namedtuple
+
+import gazetteer
+
+OFFLINE_GEOCODER_LATENCY_S = float(os.environ.get("OFFLINE_GEOCODER_LATENCY_S", "0.2"))
+OFFLINE_WHISPER_RTF = float(os.environ.get("OFFLINE_WHISPER_RTF", "0.1"))  # เวลา decode ต่อความยาวเสียง 1 วินาที
+OFFLINE_WHISPER_TEXT = os.environ.get("OFFLINE_WHISPER_TEXT", "ไปวัดพระแก้ว")
+
+OfflineLocation = namedtuple("OfflineLocation", ["latitude", "longitude", "address"])
+OfflineSegment = namedtuple("OfflineSegment", ["text"])
+
+
+class OfflineGeocoder:
+    """geocoder ที่มี method geocode(query, timeout=...) เหมือน geopy แต่ตอบจาก gazetteer"""
+
+    def __init__(self, latency_s=OFFLINE_GEOCODER_LATENCY_S):
+        self.latency_s = latency_s
+
+    def geocode(self, query, timeout=None):
+        if self.latency_s:
+            time.sleep(self.latency_s)
+        canonical = gazetteer.canonical_name(query)
+        coords = gazetteer.get_coordinates(query)
+        if coords is None:
+            return None
+        return OfflineLocation(coords[0], coords[1], f"{canonical} (offline)")
+
+
+class OfflineWhisperModel:
+    """โมเดลจำลองที่ใช้ CPU ตามความยาวเสียง x RTF แล้วคืนข้อความคงที่"""
+
+    def __init__(self, model_name="offline", compute_type="int8", rtf=OFFLINE_WHISPER_RTF, text=OFFLINE_WHISPER_TEXT):
+        self.model_name = model_name
+        self.rtf = rtf
+        self.text = text
+
+    def transcribe(self, audio, **options):
+        duration_s = len(audio) / 16000 if hasattr(audio, "__len__") else 1.0
+        deadline = time.perf_counter() + duration_s * self.rtf
+        # busy-wait เพื่อให้ใช้ CPU จริงแบบเดียวกับการ decode (ไม่ใช่แค่ sleep)
+        while time.perf_counter() < deadline:
+            pass
+        return iter([OfflineSegment(self.text)]), None
+
+
+def offline_whisper_loader(model_name, compute_type):
+    return OfflineWhisperModel(model_name, compute_type)
@@ -0,0 +1,147 @@
+# --- Gazetteer ขนาดใหญ่แบบ memory-mapped (POI Index) ---
+# ไฟล์ที่สร้างจาก poi_ingest.py เปิดด้วย mmap แล้วมองเป็น NumPy array ตรงๆ (ไม่ copy)
+# เปิดไฟล์ได้แทบทันทีไม่ว่าจะมีกี่ล้านแถว และทุก process ใช้ page cache ร่วมกัน
+#
+# รูปแบบไฟล์ (little-endian, ทุก section เริ่มที่ offset หาร 8 ลงตัว):
+#   header      : magic + จำนวน place/key + offset ของแต่ละ section (ดู HEADER_FORMAT)
+#   place_lat   : int32[n_places]   ละติจูด x 1e7 (แบบเดียวกับ MAVLink)
+#   place_lon   : int32[n_places]   ลองจิจูด x 1e7
+#   name_offsets: uint64[n_places+1] ตำแหน่งชื่อที่แสดงผลใน name_pool
+#   name_pool   : UTF-8
+#   key_offsets : uint64[n_keys+1]  ตำแหน่ง key ใน key_pool
+#   key_place   : uint32[n_keys]    place id ของแต่ละ key
+#   key_pool    : UTF-8 ของชื่อที่ normalize แล้ว เรียงตาม byte (ใช้ binary search / prefix search)
+import mmap
+import os
+import struct
+import threading
+
+import numpy as np
+
+import gazetteer
+
+MAGIC = b"DGPOI\x00\x01\x00"
+HEADER_FORMAT = "<8s10Q"
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+COORD_SCALE = 1e7
+DUPLICATE_RADIUS_M = 1000.0  # ชื่อเดียวกันที่อยู่ห่างกันไม่เกินนี้ถือเป็นสถานที่เดียวกัน
+
+DEFAULT_INDEX_PATH = os.environ.get("POI_INDEX_PATH", os.path.join("data", "poi_index.bin"))
+
+
+class PoiIndex:
+    """อ่านไฟล์ POI index แบบ lazy ผ่าน mmap"""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        (magic, self.n_places, self.n_keys, off_lat, off_lon, off_name_offsets, off_name_pool,
+         off_key_offsets, off_key_place, off_key_pool, file_end) = struct.unpack_from(HEADER_FORMAT, self._mm, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} ไม่ใช่ไฟล์ POI index ที่รองรับ")
+        if file_end != len(self._mm):
+            raise ValueError(f"{path} ไม่สมบูรณ์ (คาด {file_end} bytes แต่มี {len(self._mm)})")
+
+        mm = self._mm
+        self._lat = np.frombuffer(mm, dtype="<i4", count=self.n_places, offset=off_lat)
+        self._lon = np.frombuffer(mm, dtype="<i4", count=self.n_places, offset=off_lon)
+        self._name_offsets = np.frombuffer(mm, dtype="<u8", count=self.n_places + 1, offset=off_name_offsets)
+        self._key_offsets = np.frombuffer(mm, dtype="<u8", count=self.n_keys + 1, offset=off_key_offsets)
+        self._key_place = np.frombuffer(mm, dtype="<u4", count=self.n_keys, offset=off_key_place)
+        self._name_pool = off_name_pool
+        self._key_pool = off_key_pool
+
+    def __len__(self):
+        return self.n_places
+
+    def _key(self, i):
+        start = self._key_pool + int(self._key_offsets[i])
+        end = self._key_pool + int(self._key_offsets[i + 1])
+        return self._mm[start:end]
+
+    def place(self, place_id):
+        """คืน (ชื่อ, lat, lon) ของ place id"""
+        start = self._name_pool + int(self._name_offsets[place_id])
+        end = self._name_pool + int(self._name_offsets[place_id + 1])
+        name = self._mm[start:end].decode("utf-8")
+        return name, int(self._lat[place_id]) / COORD_SCALE, int(self._lon[place_id]) / COORD_SCALE
+
+    def _lower_bound(self, key_bytes):
+        lo, hi = 0, self.n_keys
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._key(mid) < key_bytes:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def lookup(self, name):
+        """ค้นชื่อแบบตรงตัว (หลัง normalize) คืน list ของ (ชื่อ, lat, lon)"""
+        key = gazetteer.normalize_text(name).encode("utf-8")
+        if not key:
+            return []
+        results = []
+        i = self._lower_bound(key)
+        while i < self.n_keys and self._key(i) == key:
+            results.append(self.place(int(self._key_place[i])))
+            i += 1
+        return results
+
+    def lookup_unique(self, name, max_spread_m=DUPLICATE_RADIUS_M):
+        """คืน (ชื่อ, lat, lon) เมื่อชื่อนี้ชี้ไปที่เดียว (หรือหลายแถวที่อยู่ห่างกันไม่เกิน max_spread_m
+        ซึ่งถือเป็นสถานที่เดียวกันจากหลายแหล่ง) ชื่อที่ซ้ำหลายแห่ง เช่น "วัดใหม่" คืน None ให้ไปถาม provider แทน"""
+        matches = self.lookup(name)
+        if not matches:
+            return None
+        _, lat0, lon0 = matches[0]
+        for _, lat, lon in matches[1:]:
+            if gazetteer.haversine_m(lat0, lon0, lat, lon) > max_spread_m:
+                return None
+        return matches[0]
+
+    def prefix_search(self, prefix, limit=10):
+        """ค้นชื่อที่ขึ้นต้นด้วย prefix คืน list ของ (key ที่ตรง, ชื่อ, lat, lon) ไม่เกิน limit"""
+        key = gazetteer.normalize_text(prefix).encode("utf-8")
+        if not key:
+            return []
+        results = []
+        seen = set()
+        i = self._lower_bound(key)
+        while i < self.n_keys and len(results) < limit:
+            candidate = self._key(i)
+            if not candidate.startswith(key):
+                break
+            place_id = int(self._key_place[i])
+            if place_id not in seen:
+                seen.add(place_id)
+                results.append((candidate.decode("utf-8"),) + self.place(place_id))
+            i += 1
+        return results
+
+    def coordinates(self):
+        """lat/lon ของทุก place เป็น array (n, 2) หน่วยองศา (สร้าง array ใหม่)"""
+        return np.column_stack((self._lat / COORD_SCALE, self._lon / COORD_SCALE))
+
+    def close(self):
+        self._lat = self._lon = self._name_offsets = self._key_offsets = self._key_place = None
+        self._mm.close()
+
+
+# --- เปิด index ครั้งเดียวต่อ process เมื่อถูกใช้ครั้งแรก ---
+_default_index = None
+_default_checked = False
+_default_lock = threading.Lock()
+
+
+def get_default_index():
+    """คืน PoiIndex จาก POI_INDEX_PATH หรือ None ถ้ายังไม่มีไฟล์"""
+    global _default_index, _default_checked
+    if not _default_checked:
+        with _default_lock:
+            if not _default_checked:
+                if os.path.exists(DEFAULT_INDEX_PATH):
+                    _default_index = PoiIndex(DEFAULT_INDEX_PATH)
+                _default_checked = True
+    return _default_index
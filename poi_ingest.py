@@ -0,0 +1,270 @@
+# --- เครื่องมือ offline สำหรับนำเข้า POI จำนวนมากเป็นไฟล์ POI index ---
+# อ่านไฟล์แบบ streaming ทีละแถว (รองรับ .gz / .bz2) แล้วเขียนไฟล์ที่ poi_index.PoiIndex เปิดได้
+# การเรียง key ใช้ external merge sort: เรียงทีละก้อนแล้ว merge จากไฟล์ชั่วคราว
+# หน่วยความจำจึงขึ้นกับ --chunk-size ไม่ขึ้นกับจำนวนแถวในไฟล์
+#
+# ตัวอย่าง:
+#   python poi_ingest.py --format geonames TH.txt -o data/poi_index.bin
+#   python poi_ingest.py --format csv pois.csv.gz -o data/poi_index.bin
+#   osmium export -f geojsonseq thailand.osm.pbf | python poi_ingest.py --format geojsonl - -o data/poi_index.bin
+import argparse
+import bz2
+import csv
+import gzip
+import heapq
+import io
+import json
+import os
+import shutil
+import struct
+import sys
+import tempfile
+import time
+from array import array
+
+import gazetteer
+from poi_index import COORD_SCALE, HEADER_FORMAT, HEADER_SIZE, MAGIC
+
+DEFAULT_CHUNK_SIZE = 500_000  # จำนวน key ต่อก้อนก่อนเรียงแล้วเขียนลงดิสก์
+RUN_ENTRY = struct.Struct("<IH")  # place id, ความยาว key
+FLUSH_EVERY = 65_536
+
+csv.field_size_limit(sys.maxsize)
+
+
+def _open_text(path):
+    if path == "-":
+        return io.TextIOWrapper(sys.stdin.buffer, encoding="utf-8", errors="replace")
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8", errors="replace")
+    if path.endswith(".bz2"):
+        return bz2.open(path, "rt", encoding="utf-8", errors="replace")
+    return open(path, "r", encoding="utf-8", errors="replace")
+
+
+# --- ตัวอ่านแต่ละรูปแบบ: yield (ชื่อที่แสดง, lat, lon, [ชื่อเรียกอื่น]) ---
+def read_geonames(f, feature_classes=None, country=None, alternates=True):
+    """GeoNames dump (TSV 19 คอลัมน์ เช่น TH.txt หรือ allCountries.txt)"""
+    for line in f:
+        cols = line.rstrip("\n").split("\t")
+        if len(cols) < 9:
+            continue
+        if feature_classes and cols[6] not in feature_classes:
+            continue
+        if country and cols[8] != country:
+            continue
+        names = [cols[2]]
+        if alternates and cols[3]:
+            names.extend(cols[3].split(","))
+        yield cols[1], cols[4], cols[5], names
+
+
+def read_csv(f, name_column="name", alternates_column="alt_names"):
+    """CSV ที่มี header: name, lat/latitude, lon/lng/longitude และ alt_names (คั่นด้วย |) ถ้ามี"""
+    reader = csv.DictReader(f)
+    for row in reader:
+        lat = row.get("lat") or row.get("latitude")
+        lon = row.get("lon") or row.get("lng") or row.get("longitude")
+        alt = row.get(alternates_column) or ""
+        names = [n for n in alt.split("|") if n]
+        if row.get("name:th"):
+            names.append(row["name:th"])
+        yield row.get(name_column) or "", lat, lon, names
+
+
+def read_geojsonl(f):
+    """GeoJSON แบบบรรทัดละ feature (เช่น osmium export -f geojsonseq) ใช้จุดแรกของ geometry เป็นพิกัด"""
+    for line in f:
+        line = line.strip().lstrip("\x1e")
+        if not line:
+            continue
+        try:
+            feature = json.loads(line)
+        except ValueError:
+            continue
+        props = feature.get("properties") or {}
+        coords = (feature.get("geometry") or {}).get("coordinates")
+        while isinstance(coords, list) and coords and isinstance(coords[0], list):
+            coords = coords[0]
+        if not coords or len(coords) < 2:
+            continue
+        name = props.get("name:th") or props.get("name") or ""
+        names = [props[k] for k in ("name", "name:en", "alt_name", "official_name", "short_name") if props.get(k)]
+        yield name, coords[1], coords[0], names
+
+
+READERS = {"geonames": read_geonames, "csv": read_csv, "geojsonl": read_geojsonl}
+
+
+class _SpillFile:
+    """ไฟล์ชั่วคราวที่เขียน array ทีละก้อนเพื่อไม่ให้ค้างในหน่วยความจำ"""
+
+    def __init__(self, directory, name, typecode):
+        self.path = os.path.join(directory, name)
+        self._f = open(self.path, "wb")
+        self._buf = array(typecode)
+        self.count = 0
+
+    def append(self, value):
+        self._buf.append(value)
+        self.count += 1
+        if len(self._buf) >= FLUSH_EVERY:
+            self.flush()
+
+    def flush(self):
+        self._buf.tofile(self._f)
+        del self._buf[:]
+
+    def close(self):
+        self.flush()
+        self._f.close()
+
+
+def _write_run(directory, run_index, chunk):
+    chunk.sort()
+    path = os.path.join(directory, f"run_{run_index:05d}.bin")
+    with open(path, "wb") as f:
+        for key, place_id in chunk:
+            f.write(RUN_ENTRY.pack(place_id, len(key)))
+            f.write(key)
+    return path
+
+
+def _read_run(path):
+    with open(path, "rb", buffering=1 << 20) as f:
+        while True:
+            head = f.read(RUN_ENTRY.size)
+            if not head:
+                return
+            place_id, length = RUN_ENTRY.unpack(head)
+            yield f.read(length), place_id
+
+
+def _copy_aligned(out, path):
+    """คัดลอกไฟล์ชั่วคราวต่อท้าย out (เติม padding ให้ offset หาร 8 ลงตัวก่อน) คืน offset เริ่ม"""
+    pad = (-out.tell()) % 8
+    out.write(b"\x00" * pad)
+    offset = out.tell()
+    with open(path, "rb") as f:
+        shutil.copyfileobj(f, out, 1 << 20)
+    return offset
+
+
+def build_index(records, output_path, chunk_size=DEFAULT_CHUNK_SIZE, progress=None):
+    """สร้างไฟล์ POI index จาก iterable ของ (ชื่อ, lat, lon, [ชื่อเรียกอื่น]) คืน (จำนวน place, จำนวน key)"""
+    out_dir = os.path.dirname(os.path.abspath(output_path))
+    os.makedirs(out_dir, exist_ok=True)
+
+    with tempfile.TemporaryDirectory(dir=out_dir, prefix=".poi_ingest_") as tmp:
+        lat_file = _SpillFile(tmp, "lat.bin", "i")
+        lon_file = _SpillFile(tmp, "lon.bin", "i")
+        name_offsets = _SpillFile(tmp, "name_offsets.bin", "Q")
+        name_pool_path = os.path.join(tmp, "name_pool.bin")
+        runs, chunk = [], []
+        name_pool_size = 0
+
+        # ผ่านที่ 1: อ่านแบบ streaming เขียน place ลงไฟล์ และเก็บ key เป็นก้อนที่เรียงแล้ว
+        with open(name_pool_path, "wb") as name_pool:
+            name_offsets.append(0)
+            for display, lat, lon, alternates in records:
+                display = " ".join((display or "").split())
+                try:
+                    lat_e7 = int(round(float(lat) * COORD_SCALE))
+                    lon_e7 = int(round(float(lon) * COORD_SCALE))
+                except (TypeError, ValueError):
+                    continue
+                if not display or not (-90 <= lat_e7 / COORD_SCALE <= 90 and -180 <= lon_e7 / COORD_SCALE <= 180):
+                    continue
+
+                place_id = lat_file.count
+                lat_file.append(lat_e7)
+                lon_file.append(lon_e7)
+                encoded = display.encode("utf-8")
+                name_pool.write(encoded)
+                name_pool_size += len(encoded)
+                name_offsets.append(name_pool_size)
+
+                keys = {gazetteer.normalize_text(n) for n in [display] + list(alternates or [])}
+                for key in keys:
+                    key_bytes = key.encode("utf-8")
+                    if key_bytes and len(key_bytes) < 65536:
+                        chunk.append((key_bytes, place_id))
+                if len(chunk) >= chunk_size:
+                    runs.append(_write_run(tmp, len(runs), chunk))
+                    chunk = []
+                if progress and place_id % 100_000 == 0:
+                    progress(place_id)
+        if chunk:
+            runs.append(_write_run(tmp, len(runs), chunk))
+            chunk = []
+        for spill in (lat_file, lon_file, name_offsets):
+            spill.close()
+
+        # ผ่านที่ 2: merge ทุก run เป็น key ที่เรียงแล้ว (ตัดคู่ key/place ที่ซ้ำทิ้ง)
+        key_offsets = _SpillFile(tmp, "key_offsets.bin", "Q")
+        key_place = _SpillFile(tmp, "key_place.bin", "I")
+        key_pool_path = os.path.join(tmp, "key_pool.bin")
+        key_pool_size = 0
+        with open(key_pool_path, "wb") as key_pool:
+            key_offsets.append(0)
+            previous = None
+            for key_bytes, place_id in heapq.merge(*(_read_run(path) for path in runs)):
+                if (key_bytes, place_id) == previous:
+                    continue
+                previous = (key_bytes, place_id)
+                key_pool.write(key_bytes)
+                key_pool_size += len(key_bytes)
+                key_offsets.append(key_pool_size)
+                key_place.append(place_id)
+        key_offsets.close()
+        key_place.close()
+
+        # ประกอบไฟล์จริง เขียนลงไฟล์ชั่วคราวแล้ว rename เพื่อให้ process ที่เปิดไฟล์เก่าอยู่ไม่พัง
+        n_places, n_keys = lat_file.count, key_place.count
+        partial_path = output_path + ".partial"
+        with open(partial_path, "wb") as out:
+            out.write(b"\x00" * HEADER_SIZE)
+            offsets = [_copy_aligned(out, spill.path) for spill in (lat_file, lon_file, name_offsets)]
+            offsets.append(_copy_aligned(out, name_pool_path))
+            offsets.extend(_copy_aligned(out, spill.path) for spill in (key_offsets, key_place))
+            offsets.append(_copy_aligned(out, key_pool_path))
+            file_end = out.tell()
+            out.seek(0)
+            out.write(struct.pack(HEADER_FORMAT, MAGIC, n_places, n_keys, *offsets, file_end))
+        os.replace(partial_path, output_path)
+    return n_places, n_keys
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="นำเข้า POI dump (GeoNames / CSV / GeoJSON lines) เป็นไฟล์ POI index")
+    parser.add_argument("inputs", nargs="+", help="ไฟล์นำเข้า (.gz/.bz2 ได้, '-' = stdin)")
+    parser.add_argument("--format", choices=sorted(READERS), required=True)
+    parser.add_argument("-o", "--output", default=os.path.join("data", "poi_index.bin"))
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--feature-classes", default="", help="GeoNames: feature class ที่ต้องการ เช่น 'PSLHST'")
+    parser.add_argument("--country", default="", help="GeoNames: รหัสประเทศ เช่น TH")
+    parser.add_argument("--no-alternates", action="store_true", help="GeoNames: ไม่ใช้ alternatenames")
+    args = parser.parse_args(argv)
+
+    def records():
+        for path in args.inputs:
+            with _open_text(path) as f:
+                if args.format == "geonames":
+                    yield from read_geonames(
+                        f, set(args.feature_classes) or None, args.country or None, not args.no_alternates
+                    )
+                else:
+                    yield from READERS[args.format](f)
+
+    started = time.time()
+    n_places, n_keys = build_index(
+        records(), args.output, args.chunk_size,
+        progress=lambda n: print(f"... {n:,} places", file=sys.stderr),
+    )
+    size_mb = os.path.getsize(args.output) / (1024 * 1024)
+    print(f"✅ เขียน {args.output}: {n_places:,} places, {n_keys:,} keys, {size_mb:.1f} MB "
+          f"ใน {time.time() - started:.1f} วินาที")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+# --- Profiling ต่อคำขอแบบเปิดเมื่อต้องการ (On-demand Request Profiling) ---
+# เปิดได้ 3 แบบ: PROFILE_ENABLED=1 (ทุกคำขอ), PROFILE_SAMPLE_RATE=0.01 (สุ่ม 1%), หรือ force=True ต่อคำขอ
+# (ในแอปคือ query flag ?profile=1)
+# PROFILE_MODE=sampling  : สุ่มดู stack ทุก PROFILE_INTERVAL_MS เขียน .folded (ใช้กับ flamegraph.pl / speedscope)
+# PROFILE_MODE=cprofile  : deterministic ด้วย cProfile เขียน .prof (ใช้กับ pstats / snakeviz)
+# ไฟล์อยู่ใน PROFILE_DIR และเก็บไว้ไม่เกิน PROFILE_MAX_FILES ไฟล์ (ลบไฟล์เก่าสุดก่อน)
+import cProfile
+import functools
+import itertools
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+PROFILE_ENABLED = os.environ.get("PROFILE_ENABLED", "0") == "1"
+PROFILE_SAMPLE_RATE = float(os.environ.get("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_MODE = os.environ.get("PROFILE_MODE", "sampling")
+PROFILE_DIR = os.environ.get("PROFILE_DIR", "profiles")
+PROFILE_MAX_FILES = int(os.environ.get("PROFILE_MAX_FILES", "50"))
+PROFILE_MIN_DURATION_MS = float(os.environ.get("PROFILE_MIN_DURATION_MS", "0"))  # เก็บเฉพาะคำขอที่ช้ากว่านี้
+PROFILE_INTERVAL_MS = float(os.environ.get("PROFILE_INTERVAL_MS", "5"))
+
+PROFILE_SUFFIXES = (".folded", ".prof")
+
+_local = threading.local()
+_counter = itertools.count(1)
+_retention_lock = threading.Lock()
+# cProfile เปิดได้ทีละตัวต่อ process ใน Python รุ่นใหม่ จึงให้ deterministic mode ทำทีละคำขอ
+_cprofile_lock = threading.Lock()
+
+
+def should_profile(force=False):
+    if force or PROFILE_ENABLED:
+        return True
+    return PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE
+
+
+def active():
+    """thread นี้กำลังอยู่ในคำขอที่ถูก profile หรือไม่ (ใช้ส่งต่อ flag ไปยัง worker process)"""
+    return getattr(_local, "active", False)
+
+
+def _frame_label(frame):
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class _StackSampler(threading.Thread):
+    """สุ่มอ่าน stack ของ thread เป้าหมายเป็นระยะ แล้วนับแบบ collapsed stack"""
+
+    def __init__(self, thread_id, interval_s):
+        super().__init__(name="request-profiler", daemon=True)
+        self.thread_id = thread_id
+        self.interval_s = interval_s
+        self.stacks = Counter()
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval_s):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(_frame_label(frame))
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+def _enforce_retention(directory):
+    with _retention_lock:
+        try:
+            entries = [
+                os.path.join(directory, name) for name in os.listdir(directory)
+                if name.endswith(PROFILE_SUFFIXES)
+            ]
+        except OSError:
+            return
+        if len(entries) <= PROFILE_MAX_FILES:
+            return
+        entries.sort(key=lambda path: os.path.getmtime(path))
+        for path in entries[:len(entries) - PROFILE_MAX_FILES]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+def _output_path(name, duration_ms, suffix):
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    stamp = time.strftime("%Y%m%d-%H%M%S")
+    safe_name = "".join(c if c.isalnum() or c in "-_" else "_" for c in name)
+    return os.path.join(
+        PROFILE_DIR, f"{stamp}_{safe_name}_{os.getpid()}-{next(_counter)}_{duration_ms:.0f}ms{suffix}"
+    )
+
+
+@contextmanager
+def profile_request(name, force=False):
+    """ครอบคำขอหนึ่งครั้ง ถ้าถูกเลือกให้ profile จะเขียนไฟล์ลง PROFILE_DIR เมื่อจบ"""
+    if active() or not should_profile(force):
+        yield
+        return
+
+    profiler = sampler = None
+    if PROFILE_MODE == "cprofile":
+        if not _cprofile_lock.acquire(blocking=False):
+            yield  # มีคำขออื่นกำลังใช้ cProfile อยู่ ข้ามไปก่อน
+            return
+        profiler = cProfile.Profile()
+    else:
+        sampler = _StackSampler(threading.get_ident(), PROFILE_INTERVAL_MS / 1000.0)
+
+    _local.active = True
+    started = time.perf_counter()
+    try:
+        if profiler:
+            profiler.enable()
+        else:
+            sampler.start()
+        yield
+    finally:
+        if profiler:
+            profiler.disable()
+        else:
+            sampler.stop()
+        _local.active = False
+        duration_ms = (time.perf_counter() - started) * 1000.0
+        try:
+            if duration_ms >= PROFILE_MIN_DURATION_MS:
+                if profiler:
+                    profiler.dump_stats(_output_path(name, duration_ms, ".prof"))
+                elif sampler.stacks:
+                    with open(_output_path(name, duration_ms, ".folded"), "w", encoding="utf-8") as f:
+                        for stack, count in sampler.stacks.most_common():
+                            f.write(f"{stack} {count}\n")
+                _enforce_retention(PROFILE_DIR)
+        except OSError:
+            pass  # เขียนไฟล์ profile ไม่ได้ต้องไม่ทำให้คำขอจริงล้ม
+        finally:
+            if profiler:
+                _cprofile_lock.release()
+
+
+def profiled(name, force=None):
+    """decorator ของ profile_request; force เป็นฟังก์ชันที่คืน True เมื่อคำขอนี้ต้อง profile"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with profile_request(name, force=bool(force and force())):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
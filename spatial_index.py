@@ -0,0 +1,152 @@
+# --- Spatial Index สำหรับค้นหาสถานที่ใกล้พิกัด (Nearest-place / Reverse lookup) ---
+# ใช้ k-d tree 3 มิติบนพิกัดแบบ unit vector (x, y, z) บนทรงกลม
+# ระยะ chord แบบ Euclidean เพิ่มขึ้นตามระยะบนผิวโลกเสมอ จึงได้ผล nearest ที่ถูกต้องทั้งประเทศ
+import heapq
+import math
+import threading
+
+import gazetteer
+
+
+def _to_xyz(lat, lon):
+    p, l = math.radians(lat), math.radians(lon)
+    cp = math.cos(p)
+    return (cp * math.cos(l), cp * math.sin(l), math.sin(p))
+
+
+def _chord_for_meters(radius_m):
+    """แปลงระยะบนผิวโลก (เมตร) เป็นความยาว chord บนทรงกลมรัศมี 1"""
+    angle = min(math.pi, radius_m / gazetteer.EARTH_RADIUS_M)
+    return 2.0 * math.sin(angle / 2.0)
+
+
+class SpatialIndex:
+    """k-d tree แบบ implicit (เรียงจุดใน list เดียว ไม่มี node object)
+
+    points: iterable ของ (name, lat, lon)
+    """
+
+    def __init__(self, points):
+        self._names = []
+        self._latlon = []
+        self._xyz = []
+        for name, lat, lon in points:
+            if lat is None or lon is None:
+                continue
+            self._names.append(name)
+            self._latlon.append((float(lat), float(lon)))
+            self._xyz.append(_to_xyz(lat, lon))
+        self._order = list(range(len(self._names)))
+        self._build(0, len(self._order), 0)
+
+    def __len__(self):
+        return len(self._order)
+
+    def _build(self, lo, hi, axis):
+        # median split แบบเรียงช่วง [lo, hi) แล้วลงไปซ้าย/ขวา
+        if hi - lo <= 1:
+            return
+        xyz = self._xyz
+        self._order[lo:hi] = sorted(self._order[lo:hi], key=lambda i: xyz[i][axis])
+        mid = (lo + hi) // 2
+        next_axis = (axis + 1) % 3
+        self._build(lo, mid, next_axis)
+        self._build(mid + 1, hi, next_axis)
+
+    def _result(self, idx):
+        lat, lon = self._latlon[idx]
+        return self._names[idx], lat, lon
+
+    def nearest(self, lat, lon, k=1):
+        """คืน list ของ (name, lat, lon, distance_m) k จุดที่ใกล้ที่สุด เรียงจากใกล้ไปไกล"""
+        if k <= 0 or not self._order:
+            return []
+        q = _to_xyz(lat, lon)
+        heap = []  # max-heap ด้วย (-dist2, idx)
+        xyz, order = self._xyz, self._order
+
+        def search(lo, hi, axis):
+            if lo >= hi:
+                return
+            mid = (lo + hi) // 2
+            idx = order[mid]
+            p = xyz[idx]
+            d2 = (p[0] - q[0]) ** 2 + (p[1] - q[1]) ** 2 + (p[2] - q[2]) ** 2
+            if len(heap) < k:
+                heapq.heappush(heap, (-d2, idx))
+            elif d2 < -heap[0][0]:
+                heapq.heapreplace(heap, (-d2, idx))
+            diff = q[axis] - p[axis]
+            next_axis = (axis + 1) % 3
+            near, far = ((lo, mid), (mid + 1, hi)) if diff < 0 else ((mid + 1, hi), (lo, mid))
+            search(near[0], near[1], next_axis)
+            if len(heap) < k or diff * diff < -heap[0][0]:
+                search(far[0], far[1], next_axis)
+
+        search(0, len(order), 0)
+        found = sorted((-neg_d2, idx) for neg_d2, idx in heap)
+        return [self._result(idx) + (gazetteer.haversine_m(lat, lon, *self._latlon[idx]),) for _, idx in found]
+
+    def within_radius(self, lat, lon, radius_m):
+        """คืน list ของ (name, lat, lon, distance_m) ที่อยู่ในรัศมี radius_m เรียงจากใกล้ไปไกล"""
+        if radius_m < 0 or not self._order:
+            return []
+        q = _to_xyz(lat, lon)
+        r = _chord_for_meters(radius_m)
+        r2 = r * r
+        hits = []
+        xyz, order = self._xyz, self._order
+
+        def search(lo, hi, axis):
+            if lo >= hi:
+                return
+            mid = (lo + hi) // 2
+            idx = order[mid]
+            p = xyz[idx]
+            d2 = (p[0] - q[0]) ** 2 + (p[1] - q[1]) ** 2 + (p[2] - q[2]) ** 2
+            if d2 <= r2:
+                hits.append((d2, idx))
+            diff = q[axis] - p[axis]
+            next_axis = (axis + 1) % 3
+            if diff - r <= 0:
+                search(lo, mid, next_axis)
+            if diff + r >= 0:
+                search(mid + 1, hi, next_axis)
+
+        search(0, len(order), 0)
+        hits.sort()
+        return [self._result(idx) + (gazetteer.haversine_m(lat, lon, *self._latlon[idx]),) for _, idx in hits]
+
+
+# --- index ของ gazetteer (สร้างครั้งเดียวต่อ process และ rebuild เมื่อ gazetteer เปลี่ยน) ---
+_index = None
+_index_version = None
+_index_lock = threading.Lock()
+
+
+def get_gazetteer_index():
+    global _index, _index_version
+    version = gazetteer.get_version()
+    if _index is None or _index_version != version:
+        with _index_lock:
+            if _index is None or _index_version != version:
+                points = [(name, e["lat"], e["lon"]) for name, e in list(gazetteer.GAZETTEER.items())]
+                _index = SpatialIndex(points)
+                _index_version = version
+    return _index
+
+
+def nearest_places(lat, lon, k=1):
+    return get_gazetteer_index().nearest(lat, lon, k)
+
+
+def places_within(lat, lon, radius_m):
+    return get_gazetteer_index().within_radius(lat, lon, radius_m)
+
+
+def reverse_geocode_offline(lat, lon, max_distance_m=500):
+    """หาสถานที่ที่รู้จักที่ใกล้พิกัดที่สุด ภายในระยะ max_distance_m (None ถ้าไม่มี)"""
+    nearest = nearest_places(lat, lon, k=1)
+    if nearest and nearest[0][3] <= max_distance_m:
+        return nearest[0]
+    return None
@@ -0,0 +1,157 @@
+# --- คำแนะนำสถานที่ขณะพิมพ์ (Type-ahead Suggestions) ---
+# prefix trie ของชื่อทางการ + alias ใน gazetteer โดยแต่ละ node เก็บ top-k ที่จัดอันดับไว้แล้ว
+# ค้นหาจึงใช้เวลาแค่ O(ความยาว prefix) ต่อการกดแป้น ถ้าได้ไม่ครบ k จะเติมจาก POI index (ถ้ามี)
+# แล้วค่อย fuzzy fallback (rapidfuzz) กับรายชื่อเล็กๆ ของ gazetteer สำหรับคำที่พิมพ์ผิด
+# ชื่อที่มีหลายคำ (เช่น "สถานี BTS สยาม") ถูกใส่ทุกจุดเริ่มคำ จึงพิมพ์ "สยาม" ก็เจอ
+import threading
+from collections import namedtuple
+
+from rapidfuzz import process as rf_process, fuzz as rf_fuzz
+
+import gazetteer
+import poi_index
+
+DEFAULT_LIMIT = 5
+NODE_TOP_K = 10             # จำนวนผลที่เก็บไว้ในแต่ละ node ของ trie
+FUZZY_MIN_CHARS = 2         # prefix สั้นกว่านี้ไม่ทำ fuzzy (ผลจะมั่วเกินไป)
+FUZZY_SCORE_CUTOFF = 80
+
+Suggestion = namedtuple("Suggestion", ["name", "matched", "latitude", "longitude", "source"])
+
+
+class PrefixIndex:
+    """prefix trie ของ (key ที่ normalize แล้ว -> ชื่อทางการ) ที่คืน top-k ได้ทันทีจากทุก node"""
+
+    def __init__(self, entries, top_k=NODE_TOP_K):
+        """entries: iterable ของ (ชื่อที่แสดง/alias, ชื่อทางการ, lat, lon)"""
+        self.top_k = top_k
+        self._root = {}
+        self._places = {}  # ชื่อทางการ -> (lat, lon)
+        self._choices = {}  # key -> (matched, ชื่อทางการ) สำหรับ fuzzy fallback
+        for matched, canonical, lat, lon in entries:
+            self._places[canonical] = (lat, lon)
+            key = gazetteer.normalize_text(matched)
+            if not key:
+                continue
+            self._choices.setdefault(key, (matched, canonical))
+            words = key.split(" ")
+            for i in range(len(words)):
+                self._insert(" ".join(words[i:]), matched, canonical, rank=(i, len(key)))
+        self._finalize(self._root)
+        self._keys = list(self._choices)
+
+    def _insert(self, key, matched, canonical, rank):
+        node = self._root
+        for ch in key:
+            node = node.setdefault(ch, {})
+            node.setdefault(None, []).append((rank, matched, canonical))
+
+    def _finalize(self, root):
+        # จัดอันดับครั้งเดียวตอนสร้าง: ตรงจากต้นชื่อก่อน, ชื่อสั้นก่อน, มีพิกัดก่อน และไม่ซ้ำชื่อทางการ
+        stack = [root]
+        while stack:
+            node = stack.pop()
+            candidates = node.get(None)
+            if candidates:
+                candidates.sort(key=lambda c: (c[0], self._places[c[2]][0] is None, c[1]))
+                best, seen = [], set()
+                for _, matched, canonical in candidates:
+                    if canonical not in seen:
+                        seen.add(canonical)
+                        best.append((matched, canonical))
+                        if len(best) >= self.top_k:
+                            break
+                node[None] = best
+            stack.extend(child for ch, child in node.items() if ch is not None)
+
+    def _suggestion(self, matched, canonical, source):
+        lat, lon = self._places[canonical]
+        return Suggestion(canonical, matched, lat, lon, source)
+
+    def prefix(self, text, limit=DEFAULT_LIMIT):
+        node = self._root
+        for ch in gazetteer.normalize_text(text):
+            node = node.get(ch)
+            if node is None:
+                return []
+        return [self._suggestion(m, c, "prefix") for m, c in node.get(None, [])[:limit]]
+
+    def fuzzy(self, text, limit=DEFAULT_LIMIT, exclude=()):
+        query = gazetteer.normalize_text(text)
+        if len(query) < FUZZY_MIN_CHARS:
+            return []
+        results, seen = [], set(exclude)
+        hits = rf_process.extract(
+            query, self._keys, scorer=rf_fuzz.partial_ratio,
+            score_cutoff=FUZZY_SCORE_CUTOFF, limit=limit + len(seen) + NODE_TOP_K,
+        )
+        for key, _, _ in hits:
+            matched, canonical = self._choices[key]
+            if canonical not in seen:
+                seen.add(canonical)
+                results.append(self._suggestion(matched, canonical, "fuzzy"))
+                if len(results) >= limit:
+                    break
+        return results
+
+
+# --- index ของ gazetteer (สร้างครั้งเดียวต่อ process และ rebuild เมื่อ gazetteer เปลี่ยน) ---
+_index = None
+_index_version = None
+_index_lock = threading.Lock()
+
+
+def get_gazetteer_prefix_index():
+    global _index, _index_version
+    version = gazetteer.get_version()
+    if _index is None or _index_version != version:
+        with _index_lock:
+            if _index is None or _index_version != version:
+                entries = [
+                    (matched, canonical, gazetteer.GAZETTEER[canonical]["lat"], gazetteer.GAZETTEER[canonical]["lon"])
+                    for matched, canonical in gazetteer.iter_names()
+                ]
+                _index = PrefixIndex(entries)
+                _index_version = version
+    return _index
+
+
+def _poi_suggestions(text, limit, exclude):
+    try:
+        index = poi_index.get_default_index()
+    except (OSError, ValueError):
+        return []
+    if index is None:
+        return []
+    results = []
+    for key, name, lat, lon in index.prefix_search(text, limit=limit + len(exclude) + NODE_TOP_K):
+        if name in exclude:
+            continue
+        # แถวชื่อเดียวกันที่อยู่ใกล้กันคือสถานที่เดียวกันจากหลายแหล่ง แสดงครั้งเดียว
+        if any(s.name == name and gazetteer.haversine_m(s.latitude, s.longitude, lat, lon) <= poi_index.DUPLICATE_RADIUS_M
+               for s in results):
+            continue
+        results.append(Suggestion(name, key, lat, lon, "poi"))
+        if len(results) >= limit:
+            break
+    return results
+
+
+def suggestion_label(suggestion, suggestions):
+    """ข้อความบนปุ่ม: เติมพิกัดเมื่อมีหลายคำแนะนำชื่อเดียวกัน (เช่น "วัดใหม่" หลายแห่ง) ให้ผู้ใช้แยกออก"""
+    if suggestion.latitude is None or sum(s.name == suggestion.name for s in suggestions) < 2:
+        return suggestion.name
+    return f"{suggestion.name} ({suggestion.latitude:.3f}, {suggestion.longitude:.3f})"
+
+
+def suggest(text, limit=DEFAULT_LIMIT):
+    """คืน Suggestion ไม่เกิน limit รายการสำหรับข้อความที่กำลังพิมพ์ (prefix -> POI index -> fuzzy)"""
+    if not gazetteer.normalize_text(text):
+        return []
+    index = get_gazetteer_prefix_index()
+    results = index.prefix(text, limit)
+    if len(results) < limit:
+        results += _poi_suggestions(text, limit - len(results), {s.name for s in results})
+    if len(results) < limit:
+        results += index.fuzzy(text, limit - len(results), exclude={s.name for s in results})
+    return results
@@ -0,0 +1,68 @@
+# ทดสอบ round-trip: poi_ingest.build_index -> poi_index.PoiIndex
+import os
+
+import poi_ingest
+from poi_index import PoiIndex
+
+RECORDS = [
+    ("วัดพระแก้ว", "13.7516", "100.4927", ["วัดพระศรีรัตนศาสดาราม", "Wat Phra Kaew"]),
+    ("วัดอรุณ", "13.7437", "100.4888", ["Wat Arun"]),
+    ("วัดใหม่", "13.9000", "100.6000", []),
+    ("วัดใหม่", "18.7900", "98.9800", []),
+    ("ไอคอน สยาม", "13.7266", "100.5104", ["ICONSIAM"]),
+    ("สยามพารากอน", "13.7462", "100.5347", ["Siam Paragon"]),
+    ("สยามพารากอน", "13.7463", "100.5348", []),  # แถวซ้ำจากอีกแหล่ง ห่างกันไม่กี่เมตร
+    ("ไม่มีพิกัด", "", "", []),  # แถวเสียต้องถูกข้าม
+]
+
+
+def _build(tmp_path, chunk_size):
+    path = os.path.join(tmp_path, "poi_index.bin")
+    n_places, n_keys = poi_ingest.build_index(iter(RECORDS), path, chunk_size=chunk_size)
+    return path, n_places, n_keys
+
+
+def test_round_trip_with_multiple_runs(tmp_path, monkeypatch):
+    # chunk_size น้อยกว่าจำนวน key มาก ทำให้ต้อง merge หลาย run
+    runs = []
+    write_run = poi_ingest._write_run
+    monkeypatch.setattr(poi_ingest, "_write_run", lambda *args: runs.append(args[1]) or write_run(*args))
+    path, n_places, n_keys = _build(str(tmp_path), chunk_size=2)
+    assert len(runs) > 3
+    _, _, n_keys_single_run = _build(str(tmp_path / "single"), chunk_size=1000)
+    assert n_places == 7
+    assert n_keys == n_keys_single_run
+
+    index = PoiIndex(path)
+    try:
+        assert len(index) == 7
+        for display, lat, lon, alternates in RECORDS[:2] + RECORDS[4:5]:
+            for name in [display] + alternates:
+                matches = index.lookup(name)
+                assert [m[0] for m in matches] == [display], name
+                assert abs(matches[0][1] - float(lat)) < 1e-6
+                assert abs(matches[0][2] - float(lon)) < 1e-6
+        assert index.lookup("wat arun") == index.lookup("  Wat   Arun ")
+        assert index.lookup("ไม่มีพิกัด") == []
+        assert index.lookup("ไม่มีที่นี่") == []
+
+        keys = [key for key, _, _, _ in index.prefix_search("วัด", limit=10)]
+        assert keys == sorted(keys)
+        assert {name for _, name, _, _ in index.prefix_search("วัด", limit=10)} == {"วัดพระแก้ว", "วัดอรุณ", "วัดใหม่"}
+        assert [name for _, name, _, _ in index.prefix_search("siam", limit=10)] == ["สยามพารากอน"]
+        assert len(index.prefix_search("วัด", limit=2)) == 2
+    finally:
+        index.close()
+
+
+def test_lookup_unique_rejects_ambiguous_names(tmp_path):
+    path, _, _ = _build(str(tmp_path), chunk_size=3)
+    index = PoiIndex(path)
+    try:
+        assert len(index.lookup("วัดใหม่")) == 2
+        assert index.lookup_unique("วัดใหม่") is None
+        assert index.lookup_unique("สยามพารากอน")[0] == "สยามพารากอน"
+        assert index.lookup_unique("wat arun")[0] == "วัดอรุณ"
+        assert index.lookup_unique("ไม่มีที่นี่") is None
+    finally:
+        index.close()
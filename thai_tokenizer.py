@@ -0,0 +1,67 @@
+# --- Tokenizer ภาษาไทยที่รู้จักชื่อสถานที่ใน Gazetteer ---
+# สร้าง dictionary trie ครั้งเดียวต่อ process จากพจนานุกรมมาตรฐาน + ทุกชื่อ/alias ใน gazetteer
+# ทำให้ชื่อสถานที่หลายคำ (เช่น "วัดพระแก้ว", "ไอคอน สยาม") ออกมาเป็น token เดียวในรอบเดียว
+# เมื่อ gazetteer เปลี่ยน จะสร้าง trie ใหม่แยกไว้แล้วสลับ reference (copy-on-write)
+# ผู้อ่านจึงตัดคำพร้อมกันได้โดยไม่ต้องถือ lock และไม่เคยเห็น trie ที่กำลังถูกแก้
+import threading
+
+import gazetteer
+
+try:
+    from pythainlp.corpus.common import thai_words
+    from pythainlp.tokenize import word_tokenize
+    from pythainlp.util import Trie
+    PYTHAINLP_AVAILABLE = True
+except ImportError:
+    PYTHAINLP_AVAILABLE = False
+
+# (version ของ gazetteer, คำจากพจนานุกรมมาตรฐาน, trie, ชื่อสถานที่ที่ normalize แล้ว)
+# ถูกแทนที่ทั้งก้อน ไม่แก้ของเดิม
+_state = None
+# ใช้เฉพาะตอนสร้าง trie ใหม่ เพื่อไม่ให้หลาย thread สร้างซ้ำพร้อมกัน
+_build_lock = threading.Lock()
+
+
+def _build(version, base_words):
+    names = frozenset(gazetteer.normalize_text(name) for name, _ in gazetteer.iter_names())
+    return (version, base_words, Trie(base_words | names), names)
+
+
+def _current():
+    """คืน (trie, ชื่อสถานที่) ล่าสุด สร้างใหม่ถ้า gazetteer เปลี่ยนตั้งแต่ครั้งก่อน
+    ระหว่างที่ thread อื่นกำลังสร้างใหม่ จะใช้ snapshot เดิมต่อไปแทนที่จะรอ"""
+    global _state
+    version = gazetteer.get_version()
+    state = _state
+    if state is not None and state[0] == version:
+        return state[2], state[3]
+    if state is None:
+        # ครั้งแรกยังไม่มี trie ให้ใช้ ต้องรอให้สร้างเสร็จ
+        with _build_lock:
+            if _state is None:
+                _state = _build(version, frozenset(thai_words()))
+            state = _state
+    elif _build_lock.acquire(blocking=False):
+        try:
+            if _state[0] != version:
+                _state = _build(version, _state[1])
+            state = _state
+        finally:
+            _build_lock.release()
+    return state[2], state[3]
+
+
+def tokenize(text):
+    """ตัดคำด้วย newmm + custom dictionary (คืน list ว่างถ้าไม่มี pythainlp)"""
+    if not PYTHAINLP_AVAILABLE or not text:
+        return []
+    trie, _ = _current()
+    return word_tokenize(text, engine='newmm', custom_dict=trie, keep_whitespace=False)
+
+
+def is_place_name(token):
+    """token นี้เป็นชื่อหรือ alias ใน gazetteer หรือไม่ (เทียบแบบ normalize แล้ว)"""
+    if not PYTHAINLP_AVAILABLE:
+        return gazetteer.canonical_name(token) is not None
+    _, place_names = _current()
+    return gazetteer.normalize_text(token) in place_names
@@ -0,0 +1,306 @@
+# --- Worker process สำหรับถอดเสียงด้วย Whisper พร้อมคิวคำขอ (Request Queue) ---
+# แยกการถอดเสียงออกจาก thread ของ Streamlit ไปยัง process เฉพาะ (workers x cpu_threads)
+# คิวมีขนาดจำกัด: ถ้าเต็มจะปฏิเสธทันที (backpressure) แทนที่จะให้ทุก session รอพร้อมกัน
+# คำขอทุกตัวมี timeout: worker ข้ามคำขอที่หมดเวลาไปแล้วตั้งแต่ยังอยู่ในคิว และหยุดถอดเสียงกลางทางเมื่อเลยกำหนด
+import atexit
+import io
+import itertools
+import multiprocessing as mp
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+
+import model_manager
+import request_profiler
+
+# ปรับ parameters เพื่อความแม่นยำสูงสุด
+TRANSCRIBE_OPTIONS = {
+    "language": "th",              # บังคับภาษาไทย
+    "beam_size": 10,               # เพิ่มจาก 5 เป็น 10 เพื่อความแม่นยำ
+    "best_of": 10,                 # เพิ่มจาก 5 เป็น 10
+    "temperature": 0.0,            # ความมั่นใจสูงสุด
+    "patience": 2,                 # เพิ่ม patience เพื่อการค้นหาที่ดีขึ้น
+    "length_penalty": 1.0,         # ควบคุมความยาวของประโยค
+    "repetition_penalty": 1.1,     # ลดการพูดซ้ำ
+    "no_repeat_ngram_size": 2,     # ป้องกันคำซ้ำในระยะสั้น
+    "suppress_blank": True,        # ลบช่วงว่าง
+    "suppress_tokens": [-1],       # ลบ tokens ที่ไม่ต้องการ
+    "without_timestamps": False,   # เก็บ timestamp ไว้เพื่อ debug
+    "word_timestamps": True,       # เพิ่ม word-level timestamps
+}
+
+# ค่าเริ่มต้นปรับได้ผ่าน environment variables
+DEFAULT_WORKERS = int(os.environ.get("WHISPER_WORKERS", "1"))
+DEFAULT_CPU_THREADS = int(os.environ.get("WHISPER_CPU_THREADS", "4"))
+DEFAULT_QUEUE_SIZE = int(os.environ.get("WHISPER_QUEUE_SIZE", "8"))
+DEFAULT_TIMEOUT_S = float(os.environ.get("WHISPER_TIMEOUT_S", "60"))
+IDLE_CHECK_S = 5.0  # worker ตรวจหาโมเดลที่ idle ทุกกี่วินาทีเมื่อไม่มีคำขอ
+
+
+# service ที่เริ่มทำงานแล้วใน process นี้ (ใช้แสดง metrics โดยไม่ต้องสร้าง service ใหม่)
+_services = []
+
+
+def running_services():
+    return [service for service in _services if not service._closed]
+
+
+class QueueFullError(Exception):
+    """คิวถอดเสียงเต็ม (ให้ผู้ใช้ลองใหม่ภายหลัง)"""
+
+
+class TranscriptionTimeoutError(Exception):
+    """ถอดเสียงไม่เสร็จภายในเวลาที่กำหนด"""
+
+
+class TranscriptionError(Exception):
+    """worker ถอดเสียงไม่สำเร็จ (เช่น โหลดโมเดลไม่ได้ หรือไฟล์เสียงเสีย)"""
+
+
+class _DeadlineExpired(Exception):
+    """เลยกำหนดเวลาระหว่างถอดเสียง (ใช้ภายใน worker เท่านั้น)"""
+
+
+def _decode(manager, tier, audio_bytes, deadline):
+    """ถอดเสียงหนึ่งคำขอ แยกเป็นฟังก์ชันเพื่อให้ model/segments หลุด scope ทันทีที่คืนค่า
+    (ถ้าค้างอยู่ใน loop ของ worker การ unload ของ ModelManager จะไม่คืนหน่วยความจำจริง)"""
+    _, model = manager.get(tier)
+    # รับได้ทั้งไฟล์เสียงดิบ (bytes) และ float32 16 kHz ที่ผ่าน audio_preprocess แล้ว
+    audio = io.BytesIO(audio_bytes) if isinstance(audio_bytes, (bytes, bytearray)) else audio_bytes
+    segments, _ = model.transcribe(audio, **TRANSCRIBE_OPTIONS)
+    # segments เป็น generator ที่ decode ทีละช่วง จึงเช็ค deadline ระหว่างทางแล้วหยุดได้ทันที
+    # ไม่ต้องถอดเสียงยาวจนจบทั้งที่ผู้เรียกเลิกรอไปแล้ว
+    texts = []
+    for segment in segments:
+        if time.time() > deadline:
+            raise _DeadlineExpired()
+        text = segment.text.strip()
+        if text:
+            texts.append(text)
+    return " ".join(texts).strip()
+
+
+def _worker_main(worker_id, cpu_threads, memory_budget_mb, idle_unload_s, request_queue, result_queue):
+    """วนรับคำขอจากคิวจนกว่าจะได้ None (สั่งปิด)"""
+    manager = model_manager.ModelManager(
+        cpu_threads=cpu_threads, memory_budget_mb=memory_budget_mb, idle_unload_s=idle_unload_s
+    )
+    try:
+        manager.load_resident()
+    except Exception as e:
+        result_queue.put(("failed", worker_id, f"ไม่สามารถโหลดโมเดล Whisper ได้เลย ({e})"))
+        return
+    result_queue.put(("models", worker_id, manager.report()))
+    reported_state = None
+
+    while True:
+        try:
+            request = request_queue.get(timeout=IDLE_CHECK_S)
+        except queue.Empty:
+            # ส่ง report เมื่อมีโมเดลถูก unload หรือการโหลดเบื้องหลังเริ่ม/เสร็จ
+            manager.unload_idle()
+            report = manager.report()
+            state = (sorted(report["models"]), report["loading"])
+            if state != reported_state:
+                result_queue.put(("models", worker_id, report))
+                reported_state = state
+            continue
+        if request is None:
+            break
+        request_id, audio_bytes, deadline, tier, profile = request
+        if time.time() > deadline:
+            result_queue.put(("expired", request_id, "คำขอหมดเวลาขณะรอในคิว"))
+            continue
+        started = time.time()
+        result_queue.put(("started", request_id, worker_id))
+        try:
+            with request_profiler.profile_request("whisper_decode", force=profile):
+                text = _decode(manager, tier, audio_bytes, deadline)
+            result_queue.put(("done", request_id, (text, time.time() - started)))
+        except _DeadlineExpired:
+            result_queue.put(("expired", request_id, "คำขอหมดเวลาระหว่างถอดเสียง"))
+        except Exception as e:
+            result_queue.put(("error", request_id, str(e)))
+        result_queue.put(("models", worker_id, manager.report()))
+
+
+class TranscriptionService:
+    """ตัวจัดการ worker processes + คิวคำขอ ใช้ร่วมกันทุก session ใน process ของ Streamlit"""
+
+    def __init__(self, workers=DEFAULT_WORKERS, cpu_threads=DEFAULT_CPU_THREADS,
+                 queue_size=DEFAULT_QUEUE_SIZE, timeout_s=DEFAULT_TIMEOUT_S,
+                 memory_budget_mb=model_manager.DEFAULT_MEMORY_BUDGET_MB,
+                 idle_unload_s=model_manager.DEFAULT_IDLE_UNLOAD_S):
+        self.workers = max(1, workers)
+        self.cpu_threads = max(1, cpu_threads)
+        self.queue_size = max(1, queue_size)
+        self.timeout_s = timeout_s
+        # งบหน่วยความจำรวมของทุก worker แบ่งเท่าๆ กัน
+        self.memory_budget_mb = memory_budget_mb
+        self.idle_unload_s = idle_unload_s
+
+        # ใช้ spawn เสมอ เพราะ fork จาก process ที่มีหลาย thread (Streamlit) ไม่ปลอดภัย
+        self._ctx = mp.get_context("spawn")
+        self._request_queue = self._ctx.Queue(maxsize=self.queue_size)
+        self._result_queue = self._ctx.Queue()
+        self._processes = {}
+        self._pending = {}
+        self._running = set()
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._closed = False
+
+        self._stats = {
+            "submitted": 0, "completed": 0, "rejected": 0,
+            "timed_out": 0, "errors": 0, "total_decode_s": 0.0,
+        }
+        self._worker_models = {}
+        self._worker_errors = {}
+
+        for worker_id in range(self.workers):
+            self._start_worker(worker_id)
+        self._dispatcher = threading.Thread(target=self._dispatch_results, name="whisper-results", daemon=True)
+        self._dispatcher.start()
+        atexit.register(self.shutdown)
+        _services.append(self)
+
+    def _start_worker(self, worker_id):
+        process = self._ctx.Process(
+            target=_worker_main,
+            args=(worker_id, self.cpu_threads, self.memory_budget_mb / self.workers,
+                  self.idle_unload_s, self._request_queue, self._result_queue),
+            name=f"whisper-worker-{worker_id}",
+            daemon=True,
+        )
+        process.start()
+        self._processes[worker_id] = process
+
+    def _restart_dead_workers(self):
+        for worker_id, process in list(self._processes.items()):
+            if not process.is_alive() and worker_id not in self._worker_errors:
+                self._start_worker(worker_id)
+
+    def _dispatch_results(self):
+        while not self._closed:
+            try:
+                kind, key, payload = self._result_queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            except (EOFError, OSError):
+                break
+            if kind == "models":
+                self._worker_models[key] = payload
+                continue
+            if kind == "started":
+                with self._lock:
+                    if key in self._pending:
+                        self._running.add(key)
+                continue
+            if kind == "failed":
+                self._worker_errors[key] = payload
+                if len(self._worker_errors) == self.workers:
+                    self._fail_all_pending(payload)
+                continue
+
+            with self._lock:
+                future = self._pending.pop(key, None)
+                self._running.discard(key)
+                if kind == "done":
+                    self._stats["completed"] += 1
+                    self._stats["total_decode_s"] += payload[1]
+                elif kind == "expired":
+                    # ถ้า future ถูกนำออกไปแล้ว ผู้เรียกนับ timeout ไปแล้วตอนเลิกรอ
+                    self._stats["timed_out"] += future is not None
+                else:
+                    self._stats["errors"] += 1
+            if future is None or future.done():
+                continue
+            if kind == "done":
+                future.set_result(payload[0])
+            elif kind == "expired":
+                future.set_exception(TranscriptionTimeoutError(payload))
+            else:
+                future.set_exception(TranscriptionError(payload))
+
+    def _fail_all_pending(self, message):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._running.clear()
+        for future in pending.values():
+            if not future.done():
+                future.set_exception(TranscriptionError(message))
+
+    def submit(self, audio_bytes, timeout_s=None, tier=model_manager.DEFAULT_TIER, profile=False):
+        """ส่งคำขอเข้าคิว คืน (request_id, Future) หรือ raise QueueFullError ถ้าคิวเต็ม"""
+        if self._closed:
+            raise TranscriptionError("service ถูกปิดแล้ว")
+        if len(self._worker_errors) == self.workers:
+            raise TranscriptionError(next(iter(self._worker_errors.values())))
+        timeout_s = self.timeout_s if timeout_s is None else timeout_s
+        self._restart_dead_workers()
+
+        request_id = next(self._ids)
+        future = Future()
+        with self._lock:
+            self._pending[request_id] = future
+        try:
+            self._request_queue.put_nowait((request_id, audio_bytes, time.time() + timeout_s, tier, profile))
+        except queue.Full:
+            with self._lock:
+                self._pending.pop(request_id, None)
+                self._stats["rejected"] += 1
+            raise QueueFullError(f"คิวถอดเสียงเต็ม ({self.queue_size} คำขอ)")
+        with self._lock:
+            self._stats["submitted"] += 1
+        return request_id, future
+
+    def transcribe(self, audio_bytes, timeout_s=None, tier=model_manager.DEFAULT_TIER, profile=None):
+        """ถอดเสียงแบบรอผล (block ได้ไม่เกิน timeout_s) profile=None คือ profile ใน worker ถ้าผู้เรียกกำลังถูก profile"""
+        timeout_s = self.timeout_s if timeout_s is None else timeout_s
+        profile = request_profiler.active() if profile is None else profile
+        request_id, future = self.submit(audio_bytes, timeout_s, tier, profile)
+        try:
+            return future.result(timeout=timeout_s)
+        except FutureTimeoutError:
+            # ปล่อยคำขอไว้ให้ worker ข้ามเอง (ถ้ายังไม่เริ่ม) หรือทิ้งผลเมื่อเสร็จ
+            with self._lock:
+                if self._pending.pop(request_id, None) is not None:
+                    self._stats["timed_out"] += 1
+                self._running.discard(request_id)
+            raise TranscriptionTimeoutError(f"ถอดเสียงไม่เสร็จภายใน {timeout_s:.0f} วินาที")
+
+    def metrics(self):
+        """สถิติของคิวและ worker สำหรับแสดงผล/monitor"""
+        with self._lock:
+            stats = dict(self._stats)
+            in_flight = len(self._pending)
+            running = len(self._running)
+        total_decode_s = stats.pop("total_decode_s")
+        stats["avg_decode_s"] = total_decode_s / stats["completed"] if stats["completed"] else 0.0
+        stats["queue_depth"] = in_flight - running
+        stats["running"] = running
+        stats["queue_capacity"] = self.queue_size
+        stats["workers"] = self.workers
+        stats["workers_alive"] = sum(p.is_alive() for p in self._processes.values())
+        stats["cpu_threads"] = self.cpu_threads
+        stats["memory_budget_mb"] = self.memory_budget_mb
+        stats["models"] = dict(self._worker_models)
+        stats["worker_errors"] = dict(self._worker_errors)
+        return stats
+
+    def shutdown(self):
+        if self._closed:
+            return
+        self._closed = True
+        for _ in self._processes:
+            try:
+                self._request_queue.put_nowait(None)
+            except Exception:
+                pass
+        for process in self._processes.values():
+            process.join(timeout=2)
+            if process.is_alive():
+                process.terminate()
+        self._fail_all_pending("service ถูกปิดแล้ว")